@@ -0,0 +1,356 @@
+import argparse
+import json
+import logging
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import requests
+from eth_account import Account
+from web3 import Web3
+import config
+
+# Benchmark putaran klaim + swap terhadap chain lokal (anvil).
+# Setiap ukuran armada dijalankan di chain baru dan proses anak baru agar state
+# global bot (nonce manager, state store, cache kontrak) dan peak memory tidak bercampur.
+#
+#   python benchmark.py                  # N = 10, 100, 1000
+#   python benchmark.py --sizes 10 100   # ukuran tertentu
+#   python benchmark.py --compare        # bandingkan hasil tersimpan per commit
+#
+# Membutuhkan anvil (Foundry) di PATH dan py-solc-x untuk mengompilasi kontrak mock.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = [10, 100, 1000]
+RESULTS_PATH = "benchmark_results.jsonl"
+SOLC_VERSION = "0.8.24"
+CLAIM_AMOUNT = 100 * 10 ** 18
+# Harga mock: 1 token = 1e-6 native, cukup kecil agar likuiditas router tidak habis
+SWAP_RATE = 10 ** 12
+ROUTER_LIQUIDITY = 1000 * 10 ** 18
+ACCOUNT_BALANCE = 10 ** 18
+BENCHMARK_TOKENS = ["SUSDT", "SUSDC", "WBTC", "WETH"]
+
+MOCK_SOURCE = """
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.0;
+
+contract MockFaucetToken {
+    mapping(address => uint256) public balanceOf;
+    mapping(address => mapping(address => uint256)) public allowance;
+    mapping(address => uint256) public lastClaimTime;
+    uint8 public decimals = 18;
+    uint256 public claimAmount;
+    uint256 public cooldown;
+
+    event Transfer(address indexed from, address indexed to, uint256 value);
+    event Approval(address indexed owner, address indexed spender, uint256 value);
+
+    constructor(uint256 _claimAmount, uint256 _cooldown) {
+        claimAmount = _claimAmount;
+        cooldown = _cooldown;
+    }
+
+    function claim() external {
+        uint256 last = lastClaimTime[msg.sender];
+        require(last == 0 || block.timestamp >= last + cooldown, "cooldown");
+        lastClaimTime[msg.sender] = block.timestamp;
+        balanceOf[msg.sender] += claimAmount;
+        emit Transfer(address(0), msg.sender, claimAmount);
+    }
+
+    function approve(address spender, uint256 value) external returns (bool) {
+        allowance[msg.sender][spender] = value;
+        emit Approval(msg.sender, spender, value);
+        return true;
+    }
+
+    function transfer(address to, uint256 value) external returns (bool) {
+        _transfer(msg.sender, to, value);
+        return true;
+    }
+
+    function transferFrom(address from, address to, uint256 value) external returns (bool) {
+        uint256 allowed = allowance[from][msg.sender];
+        if (allowed != type(uint256).max) {
+            allowance[from][msg.sender] = allowed - value;
+        }
+        _transfer(from, to, value);
+        return true;
+    }
+
+    function _transfer(address from, address to, uint256 value) internal {
+        balanceOf[from] -= value;
+        balanceOf[to] += value;
+        emit Transfer(from, to, value);
+    }
+}
+
+contract MockWETH {
+    mapping(address => uint256) public balanceOf;
+
+    event Deposit(address indexed dst, uint256 wad);
+    event Withdrawal(address indexed src, uint256 wad);
+
+    function deposit() public payable {
+        balanceOf[msg.sender] += msg.value;
+        emit Deposit(msg.sender, msg.value);
+    }
+
+    function withdraw(uint256 wad) external {
+        balanceOf[msg.sender] -= wad;
+        payable(msg.sender).transfer(wad);
+        emit Withdrawal(msg.sender, wad);
+    }
+}
+
+contract MockRouter {
+    address public WETH;
+    uint256 public rate;
+
+    constructor(address weth, uint256 _rate) payable {
+        WETH = weth;
+        rate = _rate;
+        MockWETH(weth).deposit{value: msg.value}();
+    }
+
+    receive() external payable {}
+
+    function getAmountsOut(uint256 amountIn, address[] calldata path) public view returns (uint256[] memory amounts) {
+        require(path.length == 2 && path[1] == WETH, "path");
+        amounts = new uint256[](2);
+        amounts[0] = amountIn;
+        amounts[1] = amountIn * rate / 1e18;
+    }
+
+    function swapExactTokensForETH(uint256 amountIn, uint256 amountOutMin, address[] calldata path, address to, uint256 deadline)
+        external returns (uint256[] memory amounts)
+    {
+        require(block.timestamp <= deadline, "expired");
+        amounts = getAmountsOut(amountIn, path);
+        require(amounts[1] >= amountOutMin, "slippage");
+        MockFaucetToken(path[0]).transferFrom(msg.sender, address(this), amountIn);
+        MockWETH(WETH).withdraw(amounts[1]);
+        payable(to).transfer(amounts[1]);
+    }
+}
+
+contract Multicall3 {
+    struct Call3 {
+        address target;
+        bool allowFailure;
+        bytes callData;
+    }
+
+    struct Result {
+        bool success;
+        bytes returnData;
+    }
+
+    function aggregate3(Call3[] calldata calls) external payable returns (Result[] memory returnData) {
+        returnData = new Result[](calls.length);
+        for (uint256 i = 0; i < calls.length; i++) {
+            (bool success, bytes memory data) = calls[i].target.call(calls[i].callData);
+            require(success || calls[i].allowFailure, "call failed");
+            returnData[i] = Result(success, data);
+        }
+    }
+}
+"""
+
+def compile_mocks():
+    try:
+        import solcx
+    except ImportError:
+        raise SystemExit("py-solc-x belum terpasang: pip install py-solc-x")
+    if SOLC_VERSION not in [str(v) for v in solcx.get_installed_solc_versions()]:
+        solcx.install_solc(SOLC_VERSION)
+    compiled = solcx.compile_source(MOCK_SOURCE, output_values=['abi', 'bin'], solc_version=SOLC_VERSION)
+    return {name.split(':')[-1]: contract for name, contract in compiled.items()}
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_anvil(port, block_time):
+    if shutil.which('anvil') is None:
+        raise SystemExit("anvil tidak ditemukan di PATH (pasang Foundry: https://getfoundry.sh)")
+    cmd = ['anvil', '--port', str(port), '--accounts', '1', '--silent']
+    if block_time:
+        cmd += ['--block-time', str(block_time)]
+    process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    w3 = Web3(Web3.HTTPProvider(f"http://127.0.0.1:{port}"))
+    for _ in range(100):
+        if w3.is_connected():
+            return process, w3
+        time.sleep(0.1)
+    process.terminate()
+    raise SystemExit("anvil tidak merespons")
+
+def deploy(w3, compiled, name, *args, value=0):
+    contract = w3.eth.contract(abi=compiled[name]['abi'], bytecode=compiled[name]['bin'])
+    tx_hash = contract.constructor(*args).transact({'from': w3.eth.accounts[0], 'value': value})
+    return w3.eth.wait_for_transaction_receipt(tx_hash)['contractAddress']
+
+def generate_keys(size):
+    # Deterministik agar setiap commit diukur dengan armada yang sama
+    return [Web3.to_hex(Web3.keccak(text=f"faucet-benchmark-{i}")) for i in range(size)]
+
+def setup_chain(w3, compiled, rpc_url, size):
+    tokens = {
+        name: deploy(w3, compiled, 'MockFaucetToken', CLAIM_AMOUNT, config.CLAIM_COOLDOWN)
+        for name in BENCHMARK_TOKENS
+    }
+    weth = deploy(w3, compiled, 'MockWETH')
+    router = deploy(w3, compiled, 'MockRouter', weth, SWAP_RATE, value=ROUTER_LIQUIDITY)
+
+    # Multicall3 dipasang di alamat standarnya agar bot memakai jalur produksi
+    multicall = deploy(w3, compiled, 'Multicall3')
+    code = Web3.to_hex(w3.eth.get_code(multicall))
+    w3.provider.make_request('anvil_setCode', [config.MULTICALL_ADDRESS, code])
+
+    # Saldo native akun diisi lewat satu JSON-RPC batch anvil_setBalance
+    addresses = [Account.from_key(key).address for key in generate_keys(size)]
+    payload = [
+        {"jsonrpc": "2.0", "id": i, "method": "anvil_setBalance", "params": [address, hex(ACCOUNT_BALANCE)]}
+        for i, address in enumerate(addresses)
+    ]
+    requests.post(rpc_url, json=payload, timeout=60).raise_for_status()
+    return {'tokens': tokens, 'router': router}
+
+def counter_totals(registry):
+    with registry.lock:
+        counters = dict(registry.counters)
+    # (request HTTP, panggilan JSON-RPC); item batch dihitung per method di rpc_calls_total
+    http = counters.get(('rpc_http_requests_total', None), 0)
+    return http, sum(v for (name, _), v in counters.items() if name == 'rpc_calls_total')
+
+def run_rounds(rpc_url, deployment, size, db_path):
+    # Dijalankan di proses anak: config diubah sebelum modul bot di-import karena
+    # modul-modul tersebut membaca config saat import (default argumen, instance modul)
+    config.RPC_URLS = [rpc_url]
+    config.TOKEN_ADDRESSES = deployment['tokens']
+    config.ROUTER_ADDRESS = deployment['router']
+    config.PRIVATE_KEYS = generate_keys(size)
+    config.KEYSTORE_DIR = None
+    config.KEYSTORE_BUNDLE = None
+    config.STATE_DB_PATH = db_path
+    config.METRICS_PORT = None
+    config.METRICS_SUMMARY_INTERVAL = None
+
+    import asyncio
+    import faucet_bot
+    import metrics
+    import multicall
+    import swap_to_ip
+
+    async def rounds():
+        w3, accounts = faucet_bot.setup_web3()
+        stages = {}
+        start = time.perf_counter()
+        before = counter_totals(metrics.registry)
+        claims = await faucet_bot.batch_claim_all(w3, accounts)
+        stages['claim'] = (time.perf_counter() - start, before, counter_totals(metrics.registry), sum(1 for v in claims.values() if v))
+
+        start = time.perf_counter()
+        before = counter_totals(metrics.registry)
+        state = await asyncio.to_thread(
+            multicall.fleet_snapshot, [a.address for a in accounts], config.TOKEN_ADDRESSES.values(), config.ROUTER_ADDRESS
+        )
+        await swap_to_ip.perform_swaps(w3, accounts, state, 'benchmark')
+        swapped = sum(1 for stage in swap_to_ip.state_store.store.swap_stages('benchmark').values() if stage == 'swapped')
+        stages['swap'] = (time.perf_counter() - start, before, counter_totals(metrics.registry), swapped)
+        return stages
+
+    stages = asyncio.run(rounds())
+    result = {'accounts': size, 'jobs': size * len(BENCHMARK_TOKENS)}
+    for name, (elapsed, (http_before, req_before), (http_after, req_after), done) in stages.items():
+        result[name] = {
+            'wall_seconds': round(elapsed, 3),
+            'completed': done,
+            'http_requests': http_after - http_before,
+            'rpc_requests': req_after - req_before,
+            'rpc_per_account': round((req_after - req_before) / size, 2),
+        }
+    # ru_maxrss dalam KiB di Linux; hanya proses utama, worker signer tidak termasuk
+    result['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return result
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def benchmark(size, compiled, block_time):
+    port = free_port()
+    rpc_url = f"http://127.0.0.1:{port}"
+    process, w3 = start_anvil(port, block_time)
+    try:
+        deployment = setup_chain(w3, compiled, rpc_url, size)
+        with tempfile.TemporaryDirectory() as tmp:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', rpc_url, json.dumps(deployment), str(size), os.path.join(tmp, 'state.db')],
+                check=True, capture_output=True, text=True,
+            ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+    finally:
+        process.terminate()
+        process.wait()
+
+def save_result(result, path=RESULTS_PATH):
+    with open(path, 'a') as f:
+        f.write(json.dumps(result) + '\n')
+
+def compare(path=RESULTS_PATH):
+    if not os.path.exists(path):
+        print("Belum ada hasil benchmark tersimpan")
+        return
+    with open(path) as f:
+        results = [json.loads(line) for line in f if line.strip()]
+    print(f"{'commit':<10} {'N':>5} {'claim s':>9} {'swap s':>9} {'rpc/akun':>9} {'peak MB':>8}")
+    for r in results:
+        rpc = r['claim']['rpc_per_account'] + r['swap']['rpc_per_account']
+        print(f"{r.get('commit') or '-':<10} {r['accounts']:>5} {r['claim']['wall_seconds']:>9} {r['swap']['wall_seconds']:>9} {rpc:>9.2f} {r['peak_rss_mb']:>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark putaran klaim dan swap di chain lokal")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--block-time', type=int, default=1, help="detik per blok anvil (0 = automine)")
+    parser.add_argument('--results', default=RESULTS_PATH)
+    parser.add_argument('--compare', action='store_true')
+    parser.add_argument('--child', nargs=4, metavar=('RPC_URL', 'DEPLOYMENT', 'N', 'DB'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        rpc_url, deployment, size, db_path = args.child
+        logging.disable(logging.WARNING)
+        print(json.dumps(run_rounds(rpc_url, json.loads(deployment), int(size), db_path)))
+        return
+    if args.compare:
+        compare(args.results)
+        return
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    compiled = compile_mocks()
+    for size in args.sizes:
+        logger.info(f"Benchmark {size} akun...")
+        result = benchmark(size, compiled, args.block_time)
+        result.update({'commit': git_commit(), 'timestamp': int(time.time()), 'block_time': args.block_time})
+        save_result(result, args.results)
+        logger.info(
+            f"N={size}: klaim {result['claim']['wall_seconds']} s ({result['claim']['completed']}/{result['jobs']}), "
+            f"swap {result['swap']['wall_seconds']} s ({result['swap']['completed']}/{result['jobs']}), "
+            f"{result['claim']['rpc_per_account'] + result['swap']['rpc_per_account']:.2f} RPC/akun, "
+            f"peak {result['peak_rss_mb']} MB"
+        )
+    compare(args.results)
+
+if __name__ == "__main__":
+    main()
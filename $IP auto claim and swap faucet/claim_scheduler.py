@@ -0,0 +1,166 @@
+import asyncio
+import heapq
+import logging
+import time
+import config
+import multicall
+import contracts
+import rpc_pool
+import state_store
+
+logger = logging.getLogger(__name__)
+
+class ClaimScheduler:
+    def __init__(self, cooldown=config.CLAIM_COOLDOWN, retry_delay=config.CLAIM_RETRY_DELAY, store=state_store.store):
+        self.cooldown = cooldown
+        self.store = store
+        self.retry_delay = retry_delay
+        self.queue = []  # (waktu eligible berikutnya, urutan, alamat akun, nama token)
+        self.counter = 0
+        self.unknown = set()  # (alamat, token) yang lastClaimTime-nya gagal dibaca
+
+    def schedule(self, address, token, eligible_at):
+        heapq.heappush(self.queue, (eligible_at, self.counter, address, token))
+        self.counter += 1
+        if self.store:
+            self.store.set_claim(address, token, eligible_at)
+
+    def schedule_unknown(self, address, token, check_at):
+        # lastClaimTime tidak diketahui: dibaca ulang pada check_at sebelum diklaim,
+        # dan tidak disimpan ke store agar tidak dianggap jadwal yang valid
+        heapq.heappush(self.queue, (check_at, self.counter, address, token))
+        self.counter += 1
+        self.unknown.add((address, token))
+
+    def schedule_last_claim(self, address, token, last_claim, retry_at):
+        eligible_at = self.next_eligible(last_claim)
+        if eligible_at is None:
+            self.schedule_unknown(address, token, retry_at)
+        else:
+            self.schedule(address, token, max(eligible_at, retry_at))
+
+    def load_snapshot(self, state):
+        for address, account_state in state['accounts'].items():
+            for token_address, token_state in account_state['tokens'].items():
+                token = contracts.TOKEN_NAMES[token_address]
+                self.schedule_last_claim(address, token, token_state['last_claim'], 0)
+
+    def load_store(self, addresses):
+        # Jadwal tersimpan dipakai ulang; akun yang belum lengkap dikembalikan untuk di-snapshot
+        saved = self.store.claim_schedule() if self.store else {}
+        missing = []
+        for address in addresses:
+            jobs = [(address, token) for token in contracts.TOKEN_ADDRESSES]
+            if all(job in saved for job in jobs):
+                for job in jobs:
+                    heapq.heappush(self.queue, (saved[job], self.counter, *job))
+                    self.counter += 1
+            else:
+                missing.append(address)
+        return missing
+
+    def next_eligible(self, last_claim):
+        if last_claim is None:
+            return None
+        if not last_claim:
+            return 0
+        return last_claim + self.cooldown
+
+    def pop_due(self, now, limit=None):
+        due = []
+        while self.queue and self.queue[0][0] <= now and (limit is None or len(due) < limit):
+            _, _, address, token = heapq.heappop(self.queue)
+            due.append((address, token))
+        return due
+
+    def refresh(self, jobs):
+        # Baca ulang lastClaimTime hanya untuk akun yang klaimnya gagal
+        state = multicall.fleet_snapshot(list(dict.fromkeys(address for address, _ in jobs)), config.TOKEN_ADDRESSES.values())
+        return {
+            (address, token): state['accounts'][address]['tokens'][contracts.TOKEN_ADDRESSES[token]]['last_claim']
+            for address, token in jobs
+        }
+
+    async def read_last_claims(self, jobs):
+        # Pembacaan yang gagal seluruhnya (mis. semua endpoint RPC gagal) membuat
+        # lastClaimTime job tersebut tidak diketahui, bukan menghentikan scheduler
+        try:
+            return await asyncio.to_thread(self.refresh, jobs)
+        except Exception as e:
+            logger.error(f"Gagal membaca lastClaimTime untuk {len(jobs)} klaim: {e}")
+            return dict.fromkeys(jobs)
+
+    async def run_slice(self, dispatch, due):
+        now = time.time()
+        unknown = [job for job in due if job in self.unknown]
+        if unknown:
+            # Klaim dengan lastClaimTime yang tidak diketahui bisa revert; baca ulang dulu
+            self.unknown.difference_update(unknown)
+            due = [job for job in due if job not in unknown]
+            last_claims = await self.read_last_claims(unknown)
+            for job in unknown:
+                eligible_at = self.next_eligible(last_claims[job])
+                if eligible_at is None:
+                    self.schedule_unknown(*job, now + self.retry_delay)
+                elif eligible_at <= now:
+                    due.append(job)
+                else:
+                    self.schedule(*job, eligible_at)
+            if not due:
+                return
+
+        logger.info(f"Menjalankan {len(due)} klaim yang sudah eligible")
+        try:
+            results = await dispatch(due)
+        except Exception as e:
+            # Mis. fee gagal dibaca atau semua endpoint gagal; status klaim tidak diketahui,
+            # jadi lastClaimTime dibaca ulang dan dicoba lagi setelah retry_delay
+            logger.error(f"Dispatch {len(due)} klaim gagal: {e}")
+            results = dict.fromkeys(due, False)
+        now = time.time()
+
+        failed = [job for job, success in results.items() if not success]
+        for job, success in results.items():
+            if success:
+                self.schedule(*job, now + self.cooldown)
+        if failed:
+            last_claims = await self.read_last_claims(failed)
+            for job in failed:
+                self.schedule_last_claim(*job, last_claims[job], now + self.retry_delay)
+        if self.store:
+            await asyncio.to_thread(self.store.flush)
+
+    async def run(self, dispatch, window=config.CLAIM_DISPATCH_WINDOW, concurrency=config.CLAIM_CONCURRENCY):
+        # Setiap `window` detik satu irisan klaim dijalankan di background, sebesar kapasitas
+        # RPC yang diizinkan node saat ini. Irisan berikutnya tidak menunggu receipt irisan
+        # sebelumnya; hanya jumlah klaim yang sedang berjalan dibatasi `concurrency`.
+        running = {}  # task -> jumlah klaim di irisan itu
+        next_slice = 0
+        while True:
+            if not self.queue and not running:
+                logger.info("Tidak ada klaim terjadwal, scheduler berhenti")
+                return
+
+            now = time.time()
+            capacity = concurrency - sum(running.values())
+            if capacity > 0 and now >= next_slice:
+                limit = max(1, int(rpc_pool.pool.rate() * window / config.CLAIM_RPC_COST))
+                due = self.pop_due(now, min(limit, capacity))
+                if due:
+                    running[asyncio.create_task(self.run_slice(dispatch, due))] = len(due)
+                    next_slice = now + window
+                    capacity -= len(due)
+
+            # Bangun saat irisan berikutnya boleh dimulai, atau saat ada irisan yang selesai
+            timeout = None
+            if self.queue and capacity > 0:
+                timeout = max(0, max(self.queue[0][0], next_slice) - time.time())
+            if not running:
+                logger.info(f"Klaim berikutnya dalam {int(timeout)} detik, menunggu...")
+                await asyncio.sleep(timeout)
+                continue
+            done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                del running[task]
+                if task.exception() is not None:
+                    logger.error(f"Irisan klaim berhenti karena error: {task.exception()}")
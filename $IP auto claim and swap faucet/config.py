@@ -1,8 +1,106 @@
 
 # Konfigurasi Web3
-RPC_URL = "https://testnet.storyrpc.io"
+# Daftar endpoint RPC; pembacaan diarahkan ke endpoint tersehat, transaksi
+# disiarkan ke beberapa endpoint sekaligus
+RPC_URLS = [
+    "https://testnet.storyrpc.io",
+]
+RPC_TIMEOUT = 30  # batas waktu per request (detik)
+RPC_COOLDOWN = 30  # lama endpoint dihindari setelah timeout/429/error (detik)
+RPC_HEALTH_ALPHA = 0.2  # bobot EWMA untuk latency dan error rate
+RPC_BROADCAST_COUNT = 3  # jumlah endpoint penerima eth_sendRawTransaction
+RPC_POOL_CONNECTIONS = 50  # koneksi keep-alive per endpoint
+
+# Rate limiter adaptif (AIMD) per endpoint, dalam request per detik
+RATE_LIMIT_INITIAL = 20
+RATE_LIMIT_MIN = 1
+RATE_LIMIT_MAX = 500
+RATE_LIMIT_BURST = 50
+RATE_LIMIT_INCREASE = 1  # kenaikan aditif per detik saat request sukses
+RATE_LIMIT_DECREASE = 0.5  # pengali laju saat terkena 429/timeout
+RATE_LIMIT_DECREASE_INTERVAL = 2  # jarak minimum antar penurunan laju (detik)
+CLAIM_RPC_COST = 6  # perkiraan jumlah request RPC per klaim
+CLAIM_DISPATCH_WINDOW = 10  # klaim per putaran dibatasi sebanyak kapasitas RPC selama jendela ini (detik)
+
+# Jumlah maksimum klaim yang berjalan bersamaan (async)
+CLAIM_CONCURRENCY = 200
+# Jumlah maksimum akun yang diproses swap bersamaan
+SWAP_CONCURRENCY = 50
+
+# Jeda faucet antar klaim per akun per token (detik), dihitung dari lastClaimTime
+CLAIM_COOLDOWN = 24 * 60 * 60
+# Jeda sebelum klaim yang gagal dijadwalkan ulang (detik)
+CLAIM_RETRY_DELAY = 5 * 60
+
+# Interval polling blok baru untuk pelacak receipt (detik)
+RECEIPT_POLL_INTERVAL = 2
+# Batas waktu menunggu satu transaksi tertambang (detik)
+RECEIPT_TIMEOUT = 120
+# Transaksi terkirim yang tetap di atas nonce 'pending' node setelah sekian detik
+# dianggap dibuang dari mempool, dan nonce-nya diperlakukan sebagai celah
+NONCE_DROP_TIMEOUT = 180
+
+# Fee transaksi: EIP-1559 dari eth_feeHistory, fallback ke gasPrice legacy
+FEE_USE_EIP1559 = True
+FEE_CACHE_TTL = 2  # lama data fee di-cache (detik), kira-kira satu blok
+FEE_HISTORY_BLOCKS = 5
+FEE_PRIORITY_PERCENTILE = 50
+FEE_MIN_PRIORITY = 10 ** 9  # 1 gwei
+FEE_BUMP = 1.125  # kenaikan fee per percobaan ulang (min. 10% agar replacement diterima)
+FEE_MAX_MULTIPLIER = 2  # batas kenaikan fee total
+# Transaksi yang belum tertambang setelah sekian blok diganti (nonce sama, fee naik FEE_BUMP)
+REPLACE_AFTER_BLOCKS = 2
+# Nonce yang tidak lagi ditunggu pemanggil (mis. menyerah setelah timeout) dilupakan
+# replacer setelah sekian detik jika tidak dikirim ulang
+REPLACE_EXPIRE_AFTER = 60
+
+# Toleransi slippage swap terhadap hasil getAmountsOut (0.05 = 5%)
+SWAP_SLIPPAGE = 0.05
+
+# State store SQLite untuk melanjutkan pekerjaan setelah restart
+STATE_DB_PATH = "bot_state.db"
+STATE_FLUSH_SIZE = 500  # jumlah penulisan yang dikumpulkan sebelum commit
+SWAP_ROUND_INTERVAL = 24 * 60 * 60  # jeda antar putaran swap (detik)
+LOG_INDEX_CHUNK = 2000  # rentang blok per eth_getLogs saat mengindeks Transfer
+
+# Daemon klaim + swap (python daemon.py): hasil klaim dikumpulkan selama jendela
+# ini lalu di-approve dan di-swap dalam satu batch
+DAEMON_SWAP_WINDOW = 5  # detik
+DAEMON_SWAP_BATCH = 500  # maksimum pasangan akun/token per batch swap
+# Approval/swap yang gagal diantrekan lagi setelah jeda ini, berlipat dua tiap kegagalan
+DAEMON_RETRY_DELAY = 60  # detik
+DAEMON_RETRY_MAX_DELAY = 30 * 60  # detik
 
-# Daftar private key
+# Metrik: endpoint Prometheus di http://127.0.0.1:METRICS_PORT/metrics dan
+# ringkasan di log setiap METRICS_SUMMARY_INTERVAL detik (None = nonaktif)
+METRICS_PORT = 9108
+METRICS_SUMMARY_INTERVAL = 60
+LOG_SAMPLE_EVERY = 100  # log per transaksi di hot path hanya ditulis 1 dari N
+
+# Penandatanganan transaksi di process pool
+SIGNER_WORKERS = None  # None = jumlah core CPU
+SIGNER_CHUNK_SIZE = 100  # transaksi per tugas worker
+
+# Jumlah request per JSON-RPC batch (sesuaikan dengan batas node)
+RPC_BATCH_SIZE = 200
+
+# Kontrak Multicall3 (alamat standar di hampir semua jaringan EVM).
+# Isi None untuk kembali ke eth_call biasa per token
+MULTICALL_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+MULTICALL_GAS_LIMIT = 30000000  # batas gas per eth_call aggregate3
+MULTICALL_CALL_GAS = 30000  # perkiraan gas untuk satu pembacaan view
+MULTICALL_MAX_CALLDATA = 128 * 1024  # batas ukuran calldata per eth_call (byte)
+
+# Keystore terenkripsi (disarankan): direktori berisi file keystore v3 per akun
+# dan/atau satu bundle JSON berisi list keystore. Password dibaca dari env var
+# KEYSTORE_PASSWORD_ENV atau ditanyakan saat startup.
+# Pindahkan key plaintext dengan: python keystore.py keys.txt
+KEYSTORE_DIR = "keystore"
+KEYSTORE_BUNDLE = None
+KEYSTORE_PASSWORD_ENV = "BOT_KEYSTORE_PASSWORD"
+KEY_LOAD_WORKERS = None  # None = jumlah core CPU
+
+# Daftar private key plaintext, hanya dipakai jika tidak ada keystore
 PRIVATE_KEYS = [
 ]
 
@@ -74,10 +172,51 @@ SUDT_ABI = [
         "name": "allowance",
         "outputs": [{"name": "", "type": "uint256"}],
         "type": "function"
+    },
+    {
+        "constant": True,
+        "inputs": [],
+        "name": "decimals",
+        "outputs": [{"name": "", "type": "uint8"}],
+        "type": "function"
     }
     # ... tambahkan fungsi lain yang mungkin diperlukan
 ]
 
+# ABI untuk router kontrak
+ROUTER_ABI = [
+    {
+        "inputs": [
+            {"internalType": "uint256", "name": "amountIn", "type": "uint256"},
+            {"internalType": "uint256", "name": "amountOutMin", "type": "uint256"},
+            {"internalType": "address[]", "name": "path", "type": "address[]"},
+            {"internalType": "address", "name": "to", "type": "address"},
+            {"internalType": "uint256", "name": "deadline", "type": "uint256"}
+        ],
+        "name": "swapExactTokensForETH",
+        "outputs": [{"internalType": "uint256[]", "name": "amounts", "type": "uint256[]"}],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    },
+    {
+        "inputs": [
+            {"internalType": "uint256", "name": "amountIn", "type": "uint256"},
+            {"internalType": "address[]", "name": "path", "type": "address[]"}
+        ],
+        "name": "getAmountsOut",
+        "outputs": [{"internalType": "uint256[]", "name": "amounts", "type": "uint256[]"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [],
+        "name": "WETH",
+        "outputs": [{"internalType": "address", "name": "", "type": "address"}],
+        "stateMutability": "view",
+        "type": "function"
+    }
+]
+
 # Hapus atau komentari baris di bawah ini
 # c8c4becc7a39958c839f680fa583289ede7c43342fde12096fe8024b3682c25a
 
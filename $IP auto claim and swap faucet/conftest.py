@@ -0,0 +1,30 @@
+import pytest
+import rpc_pool
+
+class FakePool:
+    # Pengganti RpcPool untuk unit test: handler(method, params) mengembalikan result,
+    # atau {'error': {...}} untuk membalas item itu dengan error JSON-RPC
+    def __init__(self, handler):
+        self.handler = handler
+        self.payloads = []
+
+    def post(self, payload):
+        self.payloads.append(payload)
+        items = payload if isinstance(payload, list) else [payload]
+        replies = []
+        for item in items:
+            result = self.handler(item['method'], item['params'])
+            if isinstance(result, dict) and set(result) == {'error'}:
+                replies.append({'jsonrpc': '2.0', 'id': item['id'], 'error': result['error']})
+            else:
+                replies.append({'jsonrpc': '2.0', 'id': item['id'], 'result': result})
+        return replies if isinstance(payload, list) else replies[0]
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    # Memasang FakePool sebagai rpc_pool.pool untuk kode yang memakai RpcBatcher default
+    def install(handler):
+        pool = FakePool(handler)
+        monkeypatch.setattr(rpc_pool, 'pool', pool)
+        return pool
+    return install
@@ -0,0 +1,88 @@
+import asyncio
+import functools
+from eth_abi import encode
+from web3 import Web3
+import config
+
+@functools.lru_cache(maxsize=None)
+def checksum(address):
+    return Web3.to_checksum_address(address)
+
+# Alamat token dalam bentuk checksum, dihitung sekali saat import
+TOKEN_ADDRESSES = {token: checksum(address) for token, address in config.TOKEN_ADDRESSES.items()}
+TOKEN_NAMES = {address: token for token, address in TOKEN_ADDRESSES.items()}
+
+CLAIM_CALLDATA = Web3.to_hex(Web3.keccak(text="claim()")[:4])
+APPROVE_SELECTOR = Web3.keccak(text="approve(address,uint256)")[:4]
+
+def claim_transaction(token_address, nonce, fees, chain_id, gas=200000):
+    # Transaksi claim() dirakit lokal tanpa build_transaction agar bisa ditandatangani di process pool
+    return {
+        'to': checksum(token_address),
+        'data': CLAIM_CALLDATA,
+        'value': 0,
+        'nonce': nonce,
+        'gas': gas,
+        'chainId': chain_id,
+        **fees,
+    }
+
+def approve_transaction(token_address, spender_address, amount, nonce, fees, chain_id, gas=200000):
+    return {
+        'to': checksum(token_address),
+        'data': Web3.to_hex(APPROVE_SELECTOR + encode(['address', 'uint256'], [checksum(spender_address), amount])),
+        'value': 0,
+        'nonce': nonce,
+        'gas': gas,
+        'chainId': chain_id,
+        **fees,
+    }
+
+class ContractRegistry:
+    # Objek kontrak dan nilai on-chain yang tidak berubah (WETH(), decimals)
+    # dibuat atau dibaca sekali lalu dipakai ulang oleh semua coroutine
+    def __init__(self, w3):
+        self.w3 = w3
+        self.contracts = {}
+        self.values = {}
+        self.lock = asyncio.Lock()
+
+    def contract(self, address, abi):
+        address = checksum(address)
+        key = (address, id(abi))
+        contract = self.contracts.get(key)
+        if contract is None:
+            contract = self.w3.eth.contract(address=address, abi=abi)
+            self.contracts[key] = contract
+        return contract
+
+    def token(self, address):
+        return self.contract(address, config.SUDT_ABI)
+
+    def router(self, address=config.ROUTER_ADDRESS):
+        return self.contract(address, config.ROUTER_ABI)
+
+    async def cached_call(self, key, call):
+        if key in self.values:
+            return self.values[key]
+        async with self.lock:
+            if key not in self.values:
+                self.values[key] = await call()
+        return self.values[key]
+
+    async def weth(self, router_address=config.ROUTER_ADDRESS):
+        router = self.router(router_address)
+        return await self.cached_call(('WETH', router.address), router.functions.WETH().call)
+
+    async def decimals(self, token_address):
+        token = self.token(token_address)
+        return await self.cached_call(('decimals', token.address), token.functions.decimals().call)
+
+_registries = {}
+
+def registry(w3):
+    # Satu registry per instance web3
+    key = id(w3)
+    if key not in _registries or _registries[key].w3 is not w3:
+        _registries[key] = ContractRegistry(w3)
+    return _registries[key]
@@ -0,0 +1,193 @@
+import asyncio
+import logging
+from collections import defaultdict
+import config
+import contracts
+import multicall
+import rpc_batch
+import state_store
+import faucet_bot
+import swap_to_ip
+import metrics
+from claim_scheduler import ClaimScheduler
+
+logger = logging.getLogger(__name__)
+
+# Tahap swap dari daemon dicatat di bawah satu id tetap, bukan per putaran 24 jam
+ROUND_ID = 'daemon'
+
+def merge_state(state, fresh):
+    # Nilai yang gagal dibaca (None) di snapshot baru tidak menimpa nilai lama
+    for address, account_state in fresh['accounts'].items():
+        target = state['accounts'][address]
+        for key in ('balance', 'nonce'):
+            if account_state[key] is not None:
+                target[key] = account_state[key]
+        for token, token_state in account_state['tokens'].items():
+            for key, value in token_state.items():
+                if value is not None:
+                    target['tokens'][token][key] = value
+
+def refresh_accounts(state, addresses, jobs, batcher=None):
+    # Saldo token dan allowance sudah diketahui dari klaim/approval/swap sebelumnya;
+    # yang perlu dibaca ulang hanya saldo native (gas) dan nonce, dalam satu batch.
+    # Akun yang saldo/allowance token-nya belum diketahui di-snapshot ulang penuh.
+    stale = list(dict.fromkeys(
+        address for address, token in jobs
+        if None in (state['accounts'][address]['tokens'][contracts.TOKEN_ADDRESSES[token]]['balance'],
+                    state['accounts'][address]['tokens'][contracts.TOKEN_ADDRESSES[token]]['allowance'])
+    ))
+    if stale:
+        merge_state(state, multicall.fleet_snapshot(stale, config.TOKEN_ADDRESSES.values(), config.ROUTER_ADDRESS, batcher))
+    addresses = [address for address in addresses if address not in stale]
+    if not addresses:
+        return
+    batcher = batcher or rpc_batch.RpcBatcher()
+    indexes = {
+        address: (
+            batcher.add('eth_getBalance', [address, 'latest']),
+            batcher.add('eth_getTransactionCount', [address, 'pending']),
+        )
+        for address in addresses
+    }
+    results = batcher.execute()
+    for address, (balance_idx, nonce_idx) in indexes.items():
+        if results[balance_idx] is not None:
+            state['accounts'][address]['balance'] = rpc_batch.to_int(results[balance_idx])
+        if results[nonce_idx] is not None:
+            state['accounts'][address]['nonce'] = rpc_batch.to_int(results[nonce_idx])
+
+def refresh_nonces(state, addresses, batcher=None):
+    # Nonce 'pending' terbaru untuk akun yang akan mengklaim, dalam satu batch. Nonce di
+    # state daemon bisa sudah berjam-jam lama, sedangkan NonceManager.sync menganggap
+    # nilainya segar; nonce yang gagal dibaca dikosongkan agar sync dilewati
+    batcher = batcher or rpc_batch.RpcBatcher()
+    indexes = {address: batcher.add('eth_getTransactionCount', [address, 'pending']) for address in addresses}
+    results = batcher.execute()
+    for address, idx in indexes.items():
+        state['accounts'][address]['nonce'] = rpc_batch.to_int(results[idx])
+
+class Daemon:
+    # Klaim dan swap dalam satu proses: klaim yang terkonfirmasi langsung masuk
+    # antrean kerja swap, memakai state armada yang sama tanpa sweep penuh
+    def __init__(self, w3, accounts, store=state_store.store):
+        self.w3 = w3
+        self.accounts = {account.address: account for account in accounts}
+        self.store = store
+        self.state = None
+        self.work = asyncio.Queue()
+        self.queued = set()  # (alamat, token) yang sedang menunggu di antrean
+        self.retries = {}  # (alamat, token) -> jumlah kegagalan swap berturut-turut
+        self.send_locks = defaultdict(asyncio.Lock)
+
+    def enqueue(self, address, token):
+        if (address, token) not in self.queued:
+            self.queued.add((address, token))
+            self.work.put_nowait((address, token))
+
+    async def start(self):
+        await asyncio.to_thread(self.store.reconcile)
+        # Satu snapshot untuk kedua sisi: lastClaimTime untuk jadwal klaim,
+        # saldo dan allowance router untuk swap
+        self.state = await asyncio.to_thread(
+            multicall.fleet_snapshot, list(self.accounts), config.TOKEN_ADDRESSES.values(), config.ROUTER_ADDRESS
+        )
+        # Saldo yang tertinggal dari klaim sebelumnya langsung dijadwalkan untuk swap
+        for address, account_state in self.state['accounts'].items():
+            for token_address, token_state in account_state['tokens'].items():
+                # Saldo yang gagal dibaca (None) ikut diantrekan dan dibaca ulang saat diproses
+                if token_state['balance'] != 0:
+                    self.enqueue(address, contracts.TOKEN_NAMES[token_address])
+        logger.info(f"{self.work.qsize()} saldo token menunggu swap saat startup")
+
+    async def dispatch_claims(self, jobs):
+        await asyncio.to_thread(refresh_nonces, self.state, list(dict.fromkeys(address for address, _ in jobs)))
+        results = await faucet_bot.batch_claim_all(
+            self.w3, list(self.accounts.values()), jobs, state=self.state, send_locks=self.send_locks
+        )
+        for (address, token), claimed in results.items():
+            if claimed:
+                token_state = self.state['accounts'][address]['tokens'][contracts.TOKEN_ADDRESSES[token]]
+                if token_state['balance'] is not None:
+                    token_state['balance'] += claimed
+                self.enqueue(address, token)
+        return results
+
+    async def run_claims(self):
+        scheduler = ClaimScheduler(store=self.store)
+        missing = scheduler.load_store(list(self.accounts))
+        if missing:
+            scheduler.load_snapshot({'accounts': {address: self.state['accounts'][address] for address in missing}})
+        await scheduler.run(self.dispatch_claims)
+
+    async def next_batch(self):
+        # Tunggu pekerjaan pertama, lalu kumpulkan yang datang selama jendela
+        # singkat agar approval, quote dan swap tetap dikirim per batch
+        jobs = [await self.work.get()]
+        await asyncio.sleep(config.DAEMON_SWAP_WINDOW)
+        while not self.work.empty() and len(jobs) < config.DAEMON_SWAP_BATCH:
+            jobs.append(self.work.get_nowait())
+        self.queued.difference_update(jobs)
+        return jobs
+
+    async def run_swaps(self):
+        while True:
+            jobs = await self.next_batch()
+            pending = set(jobs)
+            addresses = list(dict.fromkeys(address for address, _ in jobs))
+            await asyncio.to_thread(refresh_accounts, self.state, addresses, jobs)
+
+            # Token di luar batch ditandai selesai agar perform_swaps hanya menyentuh
+            # pasangan akun/token yang baru diklaim
+            stages = {
+                (address, token): 'skipped'
+                for address in addresses for token in contracts.TOKEN_ADDRESSES
+                if (address, token) not in pending
+            }
+            logger.info(f"Memproses {len(jobs)} swap dari antrean untuk {len(addresses)} akun")
+            try:
+                await swap_to_ip.perform_swaps(
+                    self.w3, [self.accounts[address] for address in addresses], self.state, ROUND_ID, stages,
+                    send_locks=self.send_locks,
+                )
+            except Exception as e:
+                logger.error(f"Batch swap gagal: {e}")
+            self.retry_failed(jobs)
+
+    def retry_failed(self, jobs):
+        # Saldo yang masih tersisa atau tidak diketahui setelah batch berarti approval
+        # atau swap-nya gagal; pasangan itu diantrekan lagi dengan jeda yang berlipat
+        loop = asyncio.get_running_loop()
+        for address, token in jobs:
+            if self.state['accounts'][address]['tokens'][contracts.TOKEN_ADDRESSES[token]]['balance'] == 0:
+                self.retries.pop((address, token), None)
+                continue
+            attempt = self.retries.get((address, token), 0)
+            self.retries[(address, token)] = attempt + 1
+            delay = min(config.DAEMON_RETRY_MAX_DELAY, config.DAEMON_RETRY_DELAY * 2 ** attempt)
+            metrics.registry.inc('retries_total', 'daemon_swap')
+            logger.warning(f"Swap {token} untuk {address} belum selesai, dicoba lagi dalam {delay} detik")
+            loop.call_later(delay, self.enqueue, address, token)
+
+    async def run(self):
+        await self.start()
+        await asyncio.gather(self.run_claims(), self.run_swaps())
+
+async def main():
+    metrics.start()
+    logger.info("Checking RPC connection...")
+    if not faucet_bot.check_rpc_connection():
+        logger.error("Failed to connect to RPC. Please check your RPC URL and network connection.")
+        return
+    w3, accounts = await swap_to_ip.setup_web3()
+    if not await swap_to_ip.check_router_contract(w3, config.ROUTER_ADDRESS):
+        logger.error("Kontrak router tidak valid. Menghentikan program.")
+        return
+    logger.info(f"Daemon berjalan untuk {len(accounts)} akun")
+    try:
+        await Daemon(w3, accounts).run()
+    finally:
+        await asyncio.to_thread(state_store.store.flush)
+
+if __name__ == "__main__":
+    asyncio.run(main())
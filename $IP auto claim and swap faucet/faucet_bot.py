@@ -1,118 +1,194 @@
+import asyncio
 import logging
-import requests
-from web3 import Web3
-import time
+from web3 import AsyncWeb3
 import config
+import multicall
+import rpc_pool
+import contracts
+import nonce_manager
+import rate_limiter
+import fee_oracle
+import replacer
+import state_store
+import keystore
+import signer
+import receipt_logs
+import metrics
+from claim_scheduler import ClaimScheduler
 from web3.exceptions import ContractLogicError
-import concurrent.futures
 from collections import defaultdict
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def check_rpc_connection(url):
+def check_rpc_connection(pool=rpc_pool.pool):
     try:
-        response = requests.post(url, json={"jsonrpc": "2.0", "method": "net_version", "params": [], "id": 1})
-        logger.info(f"RPC Response: {response.json()}")
-        response.raise_for_status()
-        return response.json()
+        response = pool.post({"jsonrpc": "2.0", "method": "net_version", "params": [], "id": 1})
+        logger.info(f"RPC Response: {response}")
+        return response
     except Exception as e:
         logger.error(f"Error connecting to RPC: {e}")
         return None
 
 def setup_web3():
-    w3 = Web3(Web3.HTTPProvider(config.RPC_URL))
-    accounts = [w3.eth.account.from_key(pk) for pk in config.PRIVATE_KEYS]
+    w3 = AsyncWeb3(rpc_pool.PooledAsyncProvider(rpc_pool.pool))
+    accounts = keystore.load_accounts()
     return w3, accounts
 
-def get_nonce(w3, address):
-    return w3.eth.get_transaction_count(address, 'pending')
-
-def get_token_balance(w3, token_address, account_address):
-    token_contract = w3.eth.contract(address=Web3.to_checksum_address(token_address), abi=config.SUDT_ABI)
-    balance = token_contract.functions.balanceOf(account_address).call()
-    return balance
-
-def claim_token(w3, account, token, address, nonce):
+async def claim_token(w3, account, token, address, send_lock, nonces=nonce_manager.manager, presigned=None):
+    # Mengembalikan jumlah token yang diterima jika berhasil, False jika gagal
     max_retries = 3
+    nonce = None
     for attempt in range(max_retries):
+        # Percobaan pertama memakai transaksi yang sudah ditandatangani per batch
+        raw_tx = None
+        if attempt == 0 and presigned is not None:
+            tx, raw_tx = presigned
+            nonce = tx['nonce']
         try:
-            logger.info(f"Mengklaim {token} untuk {account.address}... (Percobaan {attempt + 1})")
-            token_contract = w3.eth.contract(address=Web3.to_checksum_address(address), abi=config.SUDT_ABI)
-
-            balance_before = get_token_balance(w3, address, account.address)
-            logger.info(f"Saldo {token} sebelum klaim: {balance_before}")
-
-            gas_price = w3.eth.gas_price
-            gas_price_multiplier = 1.5 + (0.2 * attempt)
-
-            tx = token_contract.functions.claim().build_transaction({
-                'from': account.address,
-                'nonce': nonce,
-                'gas': 200000,
-                'gasPrice': int(gas_price * gas_price_multiplier)
-            })
-
-            signed_tx = account.sign_transaction(tx)
-            tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-            logger.info(f"Transaksi {token} terkirim untuk {account.address}. Hash: {tx_hash.hex()}")
-
-            receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=60)
+            # Kirim transaksi satu per satu per akun agar urutan nonce terjaga,
+            # lalu tunggu receipt di luar lock supaya klaim lain bisa jalan
+            if attempt > 0:
+                metrics.registry.inc('retries_total', 'claim')
+            async with send_lock:
+                metrics.log_sampled(logger, 'claim', "Mengklaim %s untuk %s... (Percobaan %d)", token, account.address, attempt + 1)
+                token_contract = contracts.registry(w3).token(address)
+
+                if raw_tx is None:
+                    fees = await fee_oracle.oracle.async_fees(attempt)
+
+                    # Nonce yang masih pending dipakai ulang sehingga percobaan berikutnya
+                    # menggantikan transaksi lama, bukan mengantre di belakangnya
+                    if nonce is None:
+                        nonce = nonces.reserve(account.address)
+                    tx = await token_contract.functions.claim().build_transaction({
+                        'from': account.address,
+                        'nonce': nonce,
+                        'gas': 200000,
+                        **fees
+                    })
+
+                submission = await replacer.engine.submit(w3, account, tx, raw_tx, 'claim')
+                tx_hash = submission.hashes[-1]
+                metrics.log_sampled(logger, 'claim_sent', "Transaksi %s terkirim untuk %s. Hash: %s", token, account.address, tx_hash.hex())
+
+            # Jika macet, replacer mengganti transaksi dengan fee lebih tinggi per tenggat blok
+            receipt = await replacer.engine.wait(w3, submission)
+            nonce = None
             if receipt['status'] == 1:
-                balance_after = get_token_balance(w3, address, account.address)
-                if balance_after > balance_before:
-                    logger.info(f"Klaim {token} berhasil untuk {account.address}! Saldo bertambah {balance_after - balance_before}")
-                    return True
-                else:
-                    logger.warning(f"Klaim {token} berhasil, tapi saldo tidak bertambah untuk {account.address}.")
+                # Jumlah klaim dibaca dari log Transfer di receipt, tanpa balanceOf tambahan
+                claimed = receipt_logs.received(receipt, address, account.address)
+                if claimed > 0:
+                    metrics.log_sampled(logger, 'claim_ok', "Klaim %s berhasil untuk %s! Saldo bertambah %d", token, account.address, claimed)
+                    return claimed
+                logger.warning(f"Klaim {token} berhasil, tapi saldo tidak bertambah untuk {account.address}.")
             else:
                 logger.warning(f"Klaim {token} gagal untuk {account.address}. Status: {receipt['status']}")
-
-            time.sleep(2 * (attempt + 1))  # Exponential backoff
+            # Transaksi yang sudah tertambang tidak dikirim ulang: revert hampir selalu berarti
+            # cooldown belum lewat, jadi scheduler yang membaca ulang lastClaimTime
+            return False
 
         except ContractLogicError as e:
             logger.error(f"Contract logic error saat mengklaim {token} untuk {account.address}: {e}")
+            if nonce is not None and nonce not in nonces.pending(account.address):
+                nonces.release(account.address, nonce)
             return False
+        except asyncio.TimeoutError:
+            logger.error(f"Klaim {token} untuk {account.address} belum tertambang setelah {config.RECEIPT_TIMEOUT} detik")
+            await asyncio.sleep(2 * (attempt + 1))
         except Exception as e:
             logger.error(f"Error saat mengklaim {token} untuk {account.address}: {e}")
-            time.sleep(2 * (attempt + 1))
+            # Nonce yang belum pernah terkirim dikembalikan agar tidak menjadi celah
+            if nonce is not None and nonce not in nonces.pending(account.address):
+                nonces.release(account.address, nonce)
+                nonce = None
+            await asyncio.sleep(2 * (attempt + 1))
 
     logger.error(f"Gagal mengklaim {token} untuk {account.address} setelah {max_retries} percobaan.")
     return False
 
-def batch_claim_all(w3, accounts):
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        futures = []
-        nonce_dict = defaultdict(int)
-
-        for account in accounts:
-            nonce = get_nonce(w3, account.address)
-            nonce_dict[account.address] = nonce
-            for token, address in config.TOKEN_ADDRESSES.items():
-                futures.append(executor.submit(claim_token, w3, account, token, address, nonce_dict[account.address]))
-                nonce_dict[account.address] += 1
-
-        results = [future.result() for future in concurrent.futures.as_completed(futures)]
-    return all(results)
-
-def claim_faucet(w3, accounts):
-    while True:
-        batch_claim_all(w3, accounts)
-        logger.info("Satu putaran klaim selesai, melanjutkan ke putaran berikutnya...")
-
-def main():
+async def batch_claim_all(w3, accounts, jobs=None, concurrency=config.CLAIM_CONCURRENCY, nonces=nonce_manager.manager, state=None, send_locks=None):
+    if jobs is None:
+        jobs = [(account.address, token) for account in accounts for token in config.TOKEN_ADDRESSES]
+    accounts_by_address = {account.address: account for account in accounts}
+    tokens_by_address = defaultdict(list)
+    for address, token in jobs:
+        tokens_by_address[address].append(token)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    # Nonce dan saldo token akun yang dijadwalkan diambil lewat Multicall3 + JSON-RPC batch,
+    # kecuali pemanggil (daemon) sudah memegang state armada yang masih berlaku
+    if state is None:
+        state = await asyncio.to_thread(
+            multicall.fleet_snapshot, list(tokens_by_address), config.TOKEN_ADDRESSES.values()
+        )
+
+    # Nonce, fee dan chain id sudah diketahui, jadi seluruh transaksi klaim putaran ini
+    # dirakit lalu ditandatangani sekaligus di process pool
+    fees = await fee_oracle.oracle.async_fees()
+    chain_id = await w3.eth.chain_id
+    keys, unsigned, skipped = [], [], []
+    for address, tokens in tokens_by_address.items():
+        chain_nonce = state['accounts'][address]['nonce']
+        if chain_nonce is not None:
+            nonces.sync(address, chain_nonce)
+        elif not nonces.is_synced(address):
+            # Nonce gagal dibaca dan belum pernah disinkronkan: klaim akun ini
+            # dianggap gagal agar dijadwalkan ulang, bukan dikirim dengan nonce 0
+            logger.warning(f"Nonce {address} gagal dibaca, klaim ditunda")
+            skipped.extend((address, token) for token in tokens)
+            continue
+        for token in tokens:
+            nonce = nonces.reserve(address)
+            keys.append((address, token))
+            unsigned.append((accounts_by_address[address], contracts.claim_transaction(contracts.TOKEN_ADDRESSES[token], nonce, fees, chain_id)))
+    signed = await signer.sign_batch(unsigned)
+
+    # Task dibuat berurutan per akun; Semaphore dan Lock asyncio bersifat FIFO
+    # sehingga transaksi tiap akun tetap terkirim sesuai urutan nonce
+    if send_locks is None:
+        send_locks = {address: asyncio.Lock() for address in tokens_by_address}
+    tasks = []
+    for (address, token), (account, tx), (raw_tx, _) in zip(keys, unsigned, signed):
+        tasks.append(asyncio.create_task(rate_limiter.run_limited(semaphore, claim_token(
+            w3, account, token, contracts.TOKEN_ADDRESSES[token], send_locks[address], nonces, (tx, raw_tx)
+        ))))
+
+    with metrics.timer('stage_seconds', 'claim_batch', metrics.INCLUSION_BUCKETS):
+        results = await asyncio.gather(*tasks)
+    # Nonce yang terlewat karena klaim gagal ditutup agar antrean akun tidak macet
+    await asyncio.gather(*(nonce_manager.fill_nonce_gaps(w3, accounts_by_address[address], nonces) for address in tokens_by_address))
+    return {**dict.fromkeys(skipped, False), **dict(zip(keys, results))}
+
+async def claim_faucet(w3, accounts, store=state_store.store):
+    # Transaksi yang tertinggal dari proses sebelumnya direkonsiliasi dulu
+    await asyncio.to_thread(store.reconcile)
+
+    # Jadwal diambil dari state store; hanya akun yang belum tercatat yang
+    # dibaca lastClaimTime-nya lewat snapshot
+    scheduler = ClaimScheduler(store=store)
+    missing = scheduler.load_store([account.address for account in accounts])
+    if missing:
+        state = await asyncio.to_thread(multicall.fleet_snapshot, missing, config.TOKEN_ADDRESSES.values())
+        scheduler.load_snapshot(state)
+    # Irisan klaim berjalan bersamaan; lock per akun dipakai bersama agar urutan kirim per akun tetap terjaga
+    send_locks = defaultdict(asyncio.Lock)
+    await scheduler.run(lambda jobs: batch_claim_all(w3, accounts, jobs, send_locks=send_locks))
+
+async def main():
+    metrics.start()
     logger.info("Checking RPC connection...")
-    rpc_response = check_rpc_connection(config.RPC_URL)
+    rpc_response = check_rpc_connection()
     if rpc_response:
         logger.info(f"RPC connection successful. Network ID: {rpc_response.get('result')}")
         w3, accounts = setup_web3()
-        chain_id = w3.eth.chain_id
+        chain_id = await w3.eth.chain_id
         logger.info(f"Terhubung ke jaringan: {chain_id}")
         for i, account in enumerate(accounts):
             logger.info(f"Menggunakan alamat {i+1}: {account.address}")
-        claim_faucet(w3, accounts)
+        await claim_faucet(w3, accounts)
     else:
         logger.error("Failed to connect to RPC. Please check your RPC URL and network connection.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import threading
+import time
+import config
+import metrics
+import rpc_batch
+
+logger = logging.getLogger(__name__)
+
+class FeeOracle:
+    # Data fee diambil sekali per blok (eth_feeHistory + eth_gasPrice dalam satu batch)
+    # lalu dipakai bersama oleh semua transaksi di blok tersebut
+    def __init__(self, ttl=config.FEE_CACHE_TTL, use_eip1559=config.FEE_USE_EIP1559):
+        self.ttl = ttl
+        self.use_eip1559 = use_eip1559
+        self.lock = threading.Lock()
+        self.cached = None
+        self.fetched_at = 0
+
+    def refresh(self):
+        batcher = rpc_batch.RpcBatcher()
+        gas_price_idx = batcher.add('eth_gasPrice', [])
+        history_idx = None
+        if self.use_eip1559:
+            history_idx = batcher.add('eth_feeHistory', [
+                hex(config.FEE_HISTORY_BLOCKS), 'latest', [config.FEE_PRIORITY_PERCENTILE]
+            ])
+        results = batcher.execute()
+
+        data = {'gas_price': rpc_batch.to_int(results[gas_price_idx]), 'base_fee': None, 'priority_fee': None}
+        if data['gas_price'] is None:
+            raise Exception("eth_gasPrice gagal dibaca")
+        history = results[history_idx] if history_idx is not None else None
+        if history and history.get('baseFeePerGas'):
+            # Elemen terakhir baseFeePerGas adalah base fee untuk blok berikutnya
+            data['base_fee'] = rpc_batch.to_int(history['baseFeePerGas'][-1])
+            rewards = sorted(rpc_batch.to_int(r[0]) for r in history.get('reward') or [] if r)
+            data['priority_fee'] = rewards[len(rewards) // 2] if rewards else config.FEE_MIN_PRIORITY
+            data['priority_fee'] = max(data['priority_fee'], config.FEE_MIN_PRIORITY)
+        elif self.use_eip1559:
+            if rpc_batch.is_method_not_found(batcher.errors.get(history_idx)):
+                logger.warning("eth_feeHistory tidak didukung node, memakai transaksi legacy gasPrice")
+                self.use_eip1559 = False
+            else:
+                # Error sementara (mis. rate limit in-band); hanya refresh ini yang memakai gasPrice
+                metrics.log_sampled(logger, 'fee_history_failed', "eth_feeHistory gagal dibaca, memakai gasPrice untuk blok ini",
+                                    level=logging.WARNING)
+        return data
+
+    def current(self):
+        with self.lock:
+            if self.cached is None or time.time() - self.fetched_at >= self.ttl:
+                self.cached = self.refresh()
+                self.fetched_at = time.time()
+            return self.cached
+
+    def fees(self, attempt=0):
+        # Setiap percobaan ulang menaikkan fee minimal sebesar syarat replacement node,
+        # dibatasi oleh FEE_MAX_MULTIPLIER
+        data = self.current()
+        multiplier = min(config.FEE_BUMP ** attempt, config.FEE_MAX_MULTIPLIER)
+        if data['base_fee'] is None:
+            return {'gasPrice': int(data['gas_price'] * multiplier)}
+        priority_fee = int(data['priority_fee'] * multiplier)
+        return {
+            'maxPriorityFeePerGas': priority_fee,
+            'maxFeePerGas': int((2 * data['base_fee'] + data['priority_fee']) * multiplier),
+        }
+
+    def bump_from(self, fees):
+        # Kenaikan minimum agar node menerima transaksi pengganti dengan nonce yang sama
+        return {field: int(value * config.FEE_BUMP) + 1 for field, value in fees.items()}
+
+    def bump(self, fees, original):
+        # Fee pengganti: minimal bump_from(fees), tidak di bawah fee pasar saat ini.
+        # None jika kenaikan itu melewati FEE_MAX_MULTIPLIER dari fee awal
+        market = self.fees()
+        bumped = {}
+        for field, value in self.bump_from(fees).items():
+            if value > original[field] * config.FEE_MAX_MULTIPLIER:
+                return None
+            bumped[field] = max(value, min(market.get(field, 0), int(original[field] * config.FEE_MAX_MULTIPLIER)))
+        return bumped
+
+    async def async_fees(self, attempt=0):
+        if self.cached is not None and time.time() - self.fetched_at < self.ttl:
+            return self.fees(attempt)
+        return await asyncio.to_thread(self.fees, attempt)
+
+oracle = FeeOracle()
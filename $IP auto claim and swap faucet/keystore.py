@@ -0,0 +1,77 @@
+import getpass
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from eth_account import Account
+from eth_utils import to_checksum_address
+import config
+
+logger = logging.getLogger(__name__)
+
+def get_password():
+    password = os.environ.get(config.KEYSTORE_PASSWORD_ENV)
+    if password is None:
+        password = getpass.getpass("Password keystore: ")
+    return password
+
+def read_keyfiles(directory=config.KEYSTORE_DIR, bundle=config.KEYSTORE_BUNDLE):
+    # Mengembalikan list of (nama, keyfile_json). Bundle adalah satu file JSON berisi
+    # list keystore v3; direktori berisi satu file keystore per akun
+    keyfiles = []
+    if bundle and os.path.exists(bundle):
+        with open(bundle) as f:
+            keyfiles.extend((f"{bundle}#{i}", keyfile) for i, keyfile in enumerate(json.load(f)))
+    if directory and os.path.isdir(directory):
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if not name.endswith('.json'):
+                continue
+            with open(path) as f:
+                keyfiles.append((path, json.load(f)))
+    return keyfiles
+
+def decrypt_keyfile(args):
+    # Dijalankan di process pool: scrypt/pbkdf2 dan penurunan public key/alamat adalah
+    # bagian termahal saat startup. Akun dikirim balik utuh (pickle menyalin key dan
+    # alamat yang sudah dihitung), jadi proses utama tidak menurunkannya lagi
+    keyfile, password = args
+    return Account.from_key(Account.decrypt(keyfile, password))
+
+def load_accounts(password=None, workers=config.KEY_LOAD_WORKERS):
+    keyfiles = read_keyfiles()
+    if not keyfiles:
+        # Fallback lama: private key plaintext di config.PRIVATE_KEYS
+        return [Account.from_key(pk) for pk in config.PRIVATE_KEYS]
+
+    password = password if password is not None else get_password()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, len(keyfiles) // ((workers or os.cpu_count() or 1) * 4))
+        accounts = list(executor.map(decrypt_keyfile, [(keyfile, password) for _, keyfile in keyfiles], chunksize=chunksize))
+
+    logger.info(f"{len(accounts)} akun dimuat dari keystore")
+    return accounts
+
+def encrypt_key(args):
+    private_key, password = args
+    return Account.encrypt(private_key, password)
+
+def import_keys(private_keys, password, directory=config.KEYSTORE_DIR, workers=config.KEY_LOAD_WORKERS):
+    # Memindahkan private key plaintext ke keystore terenkripsi, satu file per akun
+    os.makedirs(directory, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        keyfiles = list(executor.map(encrypt_key, [(pk, password) for pk in private_keys]))
+    for keyfile in keyfiles:
+        address = to_checksum_address(keyfile['address'])
+        with open(os.path.join(directory, f"{address}.json"), 'w') as f:
+            json.dump(keyfile, f)
+    return len(keyfiles)
+
+if __name__ == "__main__":
+    # Pemakaian: python keystore.py <file berisi satu private key per baris>
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    with open(sys.argv[1]) as f:
+        keys = [line.strip() for line in f if line.strip()]
+    count = import_keys(keys, get_password())
+    logger.info(f"{count} private key disimpan ke {config.KEYSTORE_DIR}")
@@ -0,0 +1,191 @@
+import bisect
+import logging
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import config
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+INCLUSION_BUCKETS = (1, 2, 5, 10, 20, 30, 60, 120, 300)
+# Nama label Prometheus per metrik; metrik lain memakai label generik
+LABEL_NAMES = {
+    'rpc_latency_seconds': 'method',
+    'rpc_calls_total': 'method',
+    'rpc_errors_total': 'method',
+    'rpc_failover_total': 'method',
+    'retries_total': 'stage',
+    'stage_seconds': 'stage',
+}
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # slot terakhir = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        # Perkiraan dari batas atas bucket, cukup untuk ringkasan log
+        if not self.count:
+            return 0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float('inf')
+
+class Metrics:
+    # Counter dan histogram in-memory; hanya memegang lock sebentar tanpa I/O
+    # sehingga aman dipanggil dari hot path (thread maupun coroutine)
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}  # (nama, label) -> nilai
+        self.histograms = {}  # (nama, label) -> Histogram
+        self.started = time.monotonic()
+
+    def inc(self, name, label=None, value=1):
+        with self.lock:
+            key = (name, label)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, label=None, buckets=LATENCY_BUCKETS):
+        with self.lock:
+            histogram = self.histograms.get((name, label))
+            if histogram is None:
+                histogram = self.histograms[(name, label)] = Histogram(buckets)
+            histogram.observe(value)
+
+    def rpc(self, method, latency, error=False):
+        self.inc('rpc_http_requests_total')
+        self.observe('rpc_latency_seconds', latency, method)
+        self.inc('rpc_calls_total', method)
+        if error:
+            self.inc('rpc_errors_total', method)
+
+    def rpc_batch(self, methods, latency, errors=()):
+        # Satu request HTTP berisi banyak panggilan: latency batch dicatat di label 'batch'
+        # dan di setiap method yang ikut, jumlah panggilan dan error dihitung per method
+        self.inc('rpc_http_requests_total')
+        self.observe('rpc_latency_seconds', latency, 'batch')
+        for method, count in Counter(methods).items():
+            self.inc('rpc_calls_total', method, count)
+            self.observe('rpc_latency_seconds', latency, method)
+        for method, count in Counter(errors).items():
+            self.inc('rpc_errors_total', method, count)
+
+    def render(self):
+        # Format teks eksposisi Prometheus
+        lines = []
+        with self.lock:
+            for (name, label), value in sorted(self.counters.items(), key=str):
+                lines.append(f"{name}{format_label(name, label)} {value}")
+            for (name, label), histogram in sorted(self.histograms.items(), key=str):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{format_label(name, label, le=bound)} {cumulative}")
+                lines.append(f"{name}_sum{format_label(name, label)} {histogram.sum}")
+                lines.append(f"{name}_count{format_label(name, label)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        with self.lock:
+            elapsed = max(time.monotonic() - self.started, 1e-9)
+            mined = sum(v for (name, _), v in self.counters.items() if name == 'tx_mined_total')
+            parts = [f"tx/s={mined / elapsed:.2f}"]
+            for (name, label), histogram in sorted(self.histograms.items(), key=str):
+                if not histogram.count:
+                    continue
+                parts.append(
+                    f"{name}{f'[{label}]' if label is not None else ''} n={histogram.count} avg={histogram.sum / histogram.count:.3f} "
+                    f"p50<={histogram.quantile(0.5)} p99<={histogram.quantile(0.99)}"
+                )
+            retries = {label: v for (name, label), v in self.counters.items() if name == 'retries_total'}
+            if retries:
+                parts.append(f"retries={retries}")
+        return '; '.join(parts)
+
+def format_label(name, label, **extra):
+    labels = {}
+    if label is not None:
+        labels[LABEL_NAMES.get(name, 'label')] = label
+    labels.update(extra)
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels.items()) + '}'
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class Timer:
+    # Pemakaian: with metrics.timer('stage_seconds', 'claim'): ...
+    def __init__(self, name, label=None, buckets=LATENCY_BUCKETS):
+        self.name, self.label, self.buckets = name, label, buckets
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        registry.observe(self.name, time.monotonic() - self.start, self.label, self.buckets)
+
+def timer(name, label=None, buckets=LATENCY_BUCKETS):
+    return Timer(name, label, buckets)
+
+_sample_counts = {}
+
+def log_sampled(log, key, msg, *args, every=config.LOG_SAMPLE_EVERY, level=logging.INFO):
+    # Hanya 1 dari setiap `every` pesan per key yang ditulis; argumen diformat
+    # oleh logging secara lazy, jadi pesan yang dilewati tidak memakan biaya format.
+    # Hitungan tanpa lock: sesekali meleset satu pesan tidak masalah
+    count = _sample_counts.get(key, 0)
+    _sample_counts[key] = count + 1
+    if count % every == 0 and log.isEnabledFor(level):
+        log.log(level, msg, *args)
+
+def summary_loop(interval):
+    while True:
+        time.sleep(interval)
+        logger.info("Metrics: %s", registry.summary())
+
+_started = False
+
+def start(port=config.METRICS_PORT, interval=config.METRICS_SUMMARY_INTERVAL):
+    # Endpoint HTTP /metrics dan ringkasan periodik berjalan di thread daemon
+    global _started
+    if _started:
+        return
+    _started = True
+    if port:
+        try:
+            server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        except OSError as e:
+            # Mis. faucet_bot dan swap_to_ip berjalan bersamaan di port yang sama;
+            # bot tetap jalan, hanya endpoint /metrics proses ini yang tidak tersedia
+            logger.warning(f"Endpoint metrics di port {port} tidak bisa dibuka: {e}")
+        else:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            logger.info(f"Metrics tersedia di http://127.0.0.1:{port}/metrics")
+    if interval:
+        threading.Thread(target=summary_loop, args=(interval,), daemon=True).start()
+
+registry = Metrics()
@@ -0,0 +1,138 @@
+import logging
+from eth_abi import decode, encode
+from web3 import Web3
+import config
+import contracts
+import rpc_batch
+
+logger = logging.getLogger(__name__)
+
+AGGREGATE3_SELECTOR = Web3.keccak(text="aggregate3((address,bool,bytes)[])")[:4]
+
+# Menjadi False setelah eth_call ke MULTICALL_ADDRESS mengembalikan '0x' (tidak ada
+# kontrak Multicall3 di chain ini); pembacaan berikutnya langsung lewat JSON-RPC batch
+_available = True
+
+def enabled():
+    return bool(config.MULTICALL_ADDRESS) and _available
+
+# Perkiraan ukuran satu entri (address, bool, bytes) setelah ABI encoding, di luar calldata-nya
+CALL_OVERHEAD_BYTES = 5 * 32
+
+def chunk_calls(calls, gas_limit=config.MULTICALL_GAS_LIMIT, call_gas=config.MULTICALL_CALL_GAS,
+                max_calldata=config.MULTICALL_MAX_CALLDATA):
+    max_calls = max(1, gas_limit // call_gas)
+    chunk, size = [], 0
+    for call in calls:
+        call_size = CALL_OVERHEAD_BYTES + len(call[1])
+        if chunk and (len(chunk) >= max_calls or size + call_size > max_calldata):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(call)
+        size += call_size
+    if chunk:
+        yield chunk
+
+def encode_aggregate3(calls):
+    return Web3.to_hex(AGGREGATE3_SELECTOR + encode(['(address,bool,bytes)[]'], [[(target, True, data) for target, data in calls]]))
+
+def add_aggregate(batcher, calls, block='latest'):
+    handles = []
+    for chunk in chunk_calls(calls):
+        idx = batcher.add('eth_call', [{
+            'to': config.MULTICALL_ADDRESS,
+            'data': encode_aggregate3(chunk),
+            'gas': hex(config.MULTICALL_GAS_LIMIT),
+        }, block])
+        handles.append((idx, chunk, block))
+    return handles
+
+def call_each(calls, batcher=None, block='latest'):
+    # Fallback tanpa Multicall3: setiap panggilan menjadi eth_call biasa dalam satu JSON-RPC batch
+    batcher = batcher or rpc_batch.RpcBatcher()
+    indexes = [batcher.add_call(target, data, block) for target, data in calls]
+    results = batcher.execute()
+    return [
+        (False, b'') if results[i] in (None, '0x') else (True, Web3.to_bytes(hexstr=results[i]))
+        for i in indexes
+    ]
+
+def decode_aggregate(results, handles, batcher=None):
+    # Chunk yang gagal dibaca ulang lewat batcher (dan pool) milik pemanggil
+    global _available
+    decoded = []
+    for idx, chunk, block in handles:
+        result = results[idx]
+        if result == '0x':
+            if _available:
+                logger.warning(f"Tidak ada kontrak Multicall3 di {config.MULTICALL_ADDRESS}, beralih ke eth_call biasa")
+            _available = False
+        else:
+            try:
+                if result is not None:
+                    decoded.extend(decode(['(bool,bytes)[]'], Web3.to_bytes(hexstr=result))[0])
+                    continue
+            except Exception as e:
+                logger.warning(f"Hasil aggregate3 tidak bisa didecode: {e}")
+            logger.warning(f"Panggilan aggregate3 gagal, {len(chunk)} pembacaan diulang lewat eth_call biasa")
+        decoded.extend(call_each(chunk, batcher, block))
+    return decoded
+
+def decode_uint(success, data):
+    # Sub-call yang gagal berarti nilainya tidak diketahui (None), bukan nol
+    if not success or len(data) < 32:
+        return None
+    return int.from_bytes(data[:32], 'big')
+
+def aggregate(calls, batcher=None, block='latest'):
+    if not enabled():
+        return call_each(calls, batcher, block)
+    batcher = batcher or rpc_batch.RpcBatcher()
+    handles = add_aggregate(batcher, calls, block)
+    return decode_aggregate(batcher.execute(), handles, batcher)
+
+def fleet_snapshot(addresses, token_addresses, spender_address=None, batcher=None):
+    if not enabled():
+        return rpc_batch.snapshot_state(addresses, token_addresses, spender_address, batcher)
+
+    batcher = batcher or rpc_batch.RpcBatcher()
+    addresses = [contracts.checksum(a) for a in addresses]
+    token_addresses = [contracts.checksum(t) for t in token_addresses]
+    spender = contracts.checksum(spender_address) if spender_address else None
+
+    # Saldo native dan nonce tetap lewat JSON-RPC batch, semua pembacaan token
+    # dikemas ke aggregate3 dan dikirim dalam batch yang sama
+    account_idx = {}
+    calls = []
+    for address in addresses:
+        account_idx[address] = (
+            batcher.add('eth_getBalance', [address, 'latest']),
+            batcher.add('eth_getTransactionCount', [address, 'pending']),
+        )
+        owner = encode(['address'], [address])
+        for token in token_addresses:
+            calls.append((token, rpc_batch.BALANCE_OF_SELECTOR + owner))
+            calls.append((token, rpc_batch.LAST_CLAIM_TIME_SELECTOR + owner))
+            if spender:
+                calls.append((token, rpc_batch.ALLOWANCE_SELECTOR + encode(['address', 'address'], [address, spender])))
+    handles = add_aggregate(batcher, calls)
+
+    results = batcher.execute()
+    decoded = iter(decode_aggregate(results, handles, batcher))
+
+    state = {'accounts': {}}
+    for address in addresses:
+        balance_idx, nonce_idx = account_idx[address]
+        tokens = {}
+        for token in token_addresses:
+            tokens[token] = {
+                'balance': decode_uint(*next(decoded)),
+                'last_claim': decode_uint(*next(decoded)),
+                'allowance': decode_uint(*next(decoded)) if spender else None,
+            }
+        state['accounts'][address] = {
+            'balance': rpc_batch.to_int(results[balance_idx]),
+            'nonce': rpc_batch.to_int(results[nonce_idx]),
+            'tokens': tokens,
+        }
+    return state
@@ -0,0 +1,144 @@
+import logging
+import threading
+import time
+import config
+import fee_oracle
+import signer
+import state_store
+
+logger = logging.getLogger(__name__)
+
+CANCEL_GAS = 21000
+
+class AccountNonces:
+    def __init__(self, base):
+        self.base = base  # nonce terendah yang belum tertambang
+        self.next = base  # nonce berikutnya yang belum pernah dibagikan
+        self.reserved = set()
+        self.sent = {}  # nonce -> hash transaksi terakhir
+        self.sent_at = {}  # nonce -> waktu (monotonic) hash terakhir dikirim
+
+class NonceManager:
+    # Semua operasi hanya memegang threading.Lock sebentar tanpa I/O, sehingga
+    # aman dipakai dari thread maupun coroutine asyncio
+    def __init__(self, store=None, drop_timeout=config.NONCE_DROP_TIMEOUT):
+        self.lock = threading.Lock()
+        self.accounts = {}
+        self.store = store
+        self.drop_timeout = drop_timeout
+
+    def sync(self, address, chain_nonce):
+        # chain_nonce adalah hasil get_transaction_count(address, 'pending')
+        with self.lock:
+            state = self.accounts.get(address)
+            if state is None:
+                self.accounts[address] = AccountNonces(chain_nonce)
+                return
+            self._advance(state, chain_nonce)
+            state.next = max(state.next, chain_nonce)
+            # Node tidak mengenal transaksi terkirim di atas nonce pending-nya; setelah
+            # tenggat lewat transaksi itu dianggap dibuang dan nonce-nya menjadi celah
+            deadline = time.monotonic() - self.drop_timeout
+            dropped = [n for n in state.sent if n >= chain_nonce and state.sent_at[n] <= deadline]
+            for nonce in dropped:
+                del state.sent[nonce]
+                del state.sent_at[nonce]
+        if dropped:
+            logger.warning(f"Nonce {dropped} untuk {address} tidak ada di mempool node, diperlakukan sebagai celah")
+
+    def is_synced(self, address):
+        with self.lock:
+            return address in self.accounts
+
+    def reserve(self, address):
+        with self.lock:
+            state = self.accounts[address]
+            # Celah diisi lebih dulu agar nonce di atasnya tidak tertahan
+            gaps = self._gaps(state)
+            nonce = gaps[0] if gaps else state.next
+            state.reserved.add(nonce)
+            state.next = max(state.next, nonce + 1)
+            return nonce
+
+    def release(self, address, nonce):
+        # Dipanggil jika transaksi gagal dikirim; nonce kembali menjadi celah
+        with self.lock:
+            state = self.accounts[address]
+            state.reserved.discard(nonce)
+            if nonce == state.next - 1 and nonce not in state.sent:
+                state.next = nonce
+                while state.next > state.base and self._is_free(state, state.next - 1):
+                    state.next -= 1
+
+    def mark_sent(self, address, nonce, tx_hash, kind=None):
+        with self.lock:
+            state = self.accounts[address]
+            state.reserved.discard(nonce)
+            state.sent[nonce] = tx_hash
+            state.sent_at[nonce] = time.monotonic()
+        if self.store:
+            self.store.record_tx(tx_hash, address, nonce, kind)
+
+    def mark_mined(self, address, nonce):
+        # Nonce yang tertambang (status apa pun) berarti semua nonce di bawahnya juga tertambang
+        with self.lock:
+            self._advance(self.accounts[address], nonce + 1)
+        if self.store:
+            self.store.mark_mined(address, nonce)
+
+    def gaps(self, address):
+        with self.lock:
+            state = self.accounts.get(address)
+            return self._gaps(state) if state else []
+
+    def pending(self, address):
+        with self.lock:
+            state = self.accounts.get(address)
+            return dict(state.sent) if state else {}
+
+    def _advance(self, state, base):
+        if base <= state.base:
+            return
+        state.base = base
+        state.reserved = {n for n in state.reserved if n >= base}
+        state.sent = {n: h for n, h in state.sent.items() if n >= base}
+        state.sent_at = {n: t for n, t in state.sent_at.items() if n >= base}
+
+    def _is_free(self, state, nonce):
+        return nonce not in state.reserved and nonce not in state.sent
+
+    def _gaps(self, state):
+        return [n for n in range(state.base, state.next) if self._is_free(state, n)]
+
+def cancel_transaction(address, nonce, fees, chain_id):
+    # Transfer 0 ke diri sendiri untuk menutup celah nonce
+    return {
+        'from': address,
+        'to': address,
+        'value': 0,
+        'nonce': nonce,
+        'gas': CANCEL_GAS,
+        'chainId': chain_id,
+        **fees,
+    }
+
+manager = NonceManager(state_store.store)
+
+async def fill_nonce_gaps(w3, account, nonces=manager):
+    gaps = nonces.gaps(account.address)
+    if not gaps:
+        return
+    fees = await fee_oracle.oracle.async_fees()
+    chain_id = await w3.eth.chain_id
+    reserved = [nonces.reserve(account.address) for _ in gaps]
+    signed = await signer.sign_batch([
+        (account, cancel_transaction(account.address, nonce, fees, chain_id)) for nonce in reserved
+    ])
+    for nonce, (raw_tx, _) in zip(reserved, signed):
+        try:
+            tx_hash = await w3.eth.send_raw_transaction(raw_tx)
+            nonces.mark_sent(account.address, nonce, tx_hash, 'cancel')
+            logger.info(f"Celah nonce {nonce} untuk {account.address} ditutup. Hash: {tx_hash.hex()}")
+        except Exception as e:
+            nonces.release(account.address, nonce)
+            logger.error(f"Gagal menutup celah nonce {nonce} untuk {account.address}: {e}")
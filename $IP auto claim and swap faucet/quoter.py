@@ -0,0 +1,50 @@
+import logging
+from eth_abi import decode, encode
+from web3 import Web3
+import config
+import contracts
+import multicall
+
+logger = logging.getLogger(__name__)
+
+GET_AMOUNTS_OUT_SELECTOR = Web3.keccak(text="getAmountsOut(uint256,address[])")[:4]
+
+# Jumlah kandidat amount per swap: amount, amount/2, amount/4, ...
+QUOTE_STEPS = 5
+
+def candidate_amounts(amount, steps=QUOTE_STEPS):
+    return [amount // (2 ** i) for i in range(steps) if amount // (2 ** i) > 0]
+
+def encode_get_amounts_out(amount, path):
+    return GET_AMOUNTS_OUT_SELECTOR + encode(['uint256', 'address[]'], [amount, path])
+
+def decode_amount_out(success, data):
+    if not success or len(data) < 64:
+        return 0
+    amounts = decode(['uint256[]'], data)[0]
+    return amounts[-1] if amounts else 0
+
+def get_amounts_out(calls, router_address=config.ROUTER_ADDRESS, batcher=None):
+    # calls: list of (amount, path). Semua quote dikirim dalam satu aggregate3,
+    # atau satu JSON-RPC batch eth_call jika Multicall3 tidak tersedia
+    router = contracts.checksum(router_address)
+    payloads = [encode_get_amounts_out(amount, path) for amount, path in calls]
+    results = multicall.aggregate([(router, data) for data in payloads], batcher)
+    return [decode_amount_out(*result) for result in results]
+
+def quote_swaps(swaps, weth_address, slippage=config.SWAP_SLIPPAGE, router_address=config.ROUTER_ADDRESS):
+    # swaps: list of (token_address, amount). Mengembalikan dict
+    # (token_address, amount) -> (amount_in, amount_out_min), atau None jika tidak ada rute
+    calls, owners = [], []
+    for token_address, amount in swaps:
+        path = [contracts.checksum(token_address), weth_address]
+        for candidate in candidate_amounts(amount):
+            calls.append((candidate, path))
+            owners.append((token_address, amount, candidate))
+
+    quotes = {swap: None for swap in swaps}
+    for (token_address, amount, candidate), amount_out in zip(owners, get_amounts_out(calls, router_address)):
+        # Kandidat diurutkan dari yang terbesar, ambil yang pertama bisa dieksekusi
+        if amount_out > 0 and quotes[(token_address, amount)] is None:
+            quotes[(token_address, amount)] = (candidate, int(amount_out * (1 - slippage)))
+    return quotes
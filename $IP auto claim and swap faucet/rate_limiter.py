@@ -0,0 +1,58 @@
+import asyncio
+import threading
+import time
+import config
+
+class RateLimiter:
+    # Token bucket dengan laju AIMD: naik perlahan saat request sukses, turun
+    # setengah saat node membalas 429/timeout atau error rate limit JSON-RPC (-32005).
+    # Aman dipakai dari thread maupun asyncio.
+    def __init__(self, rate=config.RATE_LIMIT_INITIAL, min_rate=config.RATE_LIMIT_MIN,
+                 max_rate=config.RATE_LIMIT_MAX, burst=config.RATE_LIMIT_BURST):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.last_decrease = 0
+        self.lock = threading.Lock()
+
+    def reserve(self, cost=1):
+        # Ambil token sekarang dan kembalikan lama waktu yang harus ditunggu
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= cost
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+    def acquire(self, cost=1):
+        wait = self.reserve(cost)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def async_acquire(self, cost=1):
+        wait = self.reserve(cost)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + config.RATE_LIMIT_INCREASE / self.rate)
+
+    def on_throttle(self):
+        with self.lock:
+            # Banyak request gagal bersamaan hanya dihitung sebagai satu penurunan
+            now = time.monotonic()
+            if now - self.last_decrease < config.RATE_LIMIT_DECREASE_INTERVAL:
+                return
+            self.last_decrease = now
+            self.rate = max(self.min_rate, self.rate * config.RATE_LIMIT_DECREASE)
+            self.tokens = min(self.tokens, 0)
+
+async def run_limited(semaphore, coro):
+    async with semaphore:
+        return await coro
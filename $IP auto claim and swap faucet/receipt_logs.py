@@ -0,0 +1,96 @@
+import logging
+from web3 import Web3
+import config
+import contracts
+import rpc_batch
+import state_store
+
+logger = logging.getLogger(__name__)
+
+TRANSFER_TOPIC = Web3.to_hex(Web3.keccak(text="Transfer(address,address,uint256)"))
+WITHDRAWAL_TOPIC = Web3.to_hex(Web3.keccak(text="Withdrawal(address,uint256)"))
+
+def topic_address(topic):
+    topic = topic if isinstance(topic, str) else Web3.to_hex(topic)
+    return contracts.checksum('0x' + topic[-40:])
+
+def log_value(log):
+    data = log['data'] if isinstance(log['data'], str) else Web3.to_hex(log['data'])
+    return rpc_batch.to_int(data[:66]) if len(data) > 2 else 0
+
+def decode_transfers(logs):
+    # Mengembalikan list of (token, from, to, value) dari log ERC-20 Transfer
+    transfers = []
+    for log in logs:
+        topics = [t if isinstance(t, str) else Web3.to_hex(t) for t in log['topics']]
+        if len(topics) != 3 or topics[0].lower() != TRANSFER_TOPIC:
+            continue
+        transfers.append((contracts.checksum(log['address']), topic_address(topics[1]), topic_address(topics[2]), log_value(log)))
+    return transfers
+
+def received(receipt, token_address, account_address):
+    token_address, account_address = contracts.checksum(token_address), contracts.checksum(account_address)
+    return sum(value for token, _, to, value in decode_transfers(receipt['logs']) if token == token_address and to == account_address)
+
+def sent(receipt, token_address, account_address):
+    token_address, account_address = contracts.checksum(token_address), contracts.checksum(account_address)
+    return sum(value for token, sender, _, value in decode_transfers(receipt['logs']) if token == token_address and sender == account_address)
+
+def native_out(receipt, weth_address):
+    # swapExactTokensForETH membuka WETH lewat withdraw(); jumlah native yang
+    # diterima sama dengan total event Withdrawal dari kontrak WETH
+    weth_address = contracts.checksum(weth_address)
+    total = 0
+    for log in receipt['logs']:
+        topics = [t if isinstance(t, str) else Web3.to_hex(t) for t in log['topics']]
+        if topics and topics[0].lower() == WITHDRAWAL_TOPIC and contracts.checksum(log['address']) == weth_address:
+            total += log_value(log)
+    return total
+
+def index_transfers(from_block=None, to_block=None, addresses=None, store=state_store.store,
+                    chunk=config.LOG_INDEX_CHUNK, batcher=None):
+    # Memindai event Transfer semua token di config.TOKEN_ADDRESSES ke state store.
+    # Beberapa rentang eth_getLogs dikirim dalam satu JSON-RPC batch.
+    batcher = batcher or rpc_batch.RpcBatcher()
+    if to_block is None:
+        head_idx = batcher.add('eth_blockNumber', [])
+        to_block = rpc_batch.to_int(batcher.execute()[head_idx])
+        if to_block is None:
+            raise Exception("eth_blockNumber gagal dibaca")
+    if from_block is None:
+        last = store.get_meta('transfers_indexed_block')
+        from_block = int(last) + 1 if last else max(0, to_block - chunk)
+    addresses = {contracts.checksum(a) for a in addresses} if addresses else None
+
+    indexes = []
+    for start in range(from_block, to_block + 1, chunk):
+        end = min(start + chunk - 1, to_block)
+        indexes.append(batcher.add('eth_getLogs', [{
+            'fromBlock': hex(start),
+            'toBlock': hex(end),
+            'address': list(contracts.TOKEN_ADDRESSES.values()),
+            'topics': [TRANSFER_TOPIC],
+        }]))
+    results = batcher.execute()
+
+    count = 0
+    for idx in indexes:
+        if results[idx] is None:
+            raise Exception("eth_getLogs gagal, rentang blok mungkin terlalu besar untuk node")
+        for log in results[idx]:
+            for token, sender, to, value in decode_transfers([log]):
+                if addresses and sender not in addresses and to not in addresses:
+                    continue
+                store.record_transfer(
+                    rpc_batch.to_int(log['blockNumber']), log['transactionHash'], rpc_batch.to_int(log['logIndex']),
+                    token, sender, to, value,
+                )
+                count += 1
+    store.set_meta('transfers_indexed_block', str(to_block))
+    store.flush()
+    logger.info(f"{count} event Transfer diindeks untuk blok {from_block}-{to_block}")
+    return count
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    index_transfers()
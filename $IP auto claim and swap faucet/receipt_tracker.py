@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import time
+from web3 import Web3
+import config
+import rpc_batch
+import metrics
+
+logger = logging.getLogger(__name__)
+
+def normalize_hash(tx_hash):
+    if isinstance(tx_hash, (bytes, bytearray)):
+        return Web3.to_hex(tx_hash).lower()
+    tx_hash = tx_hash.lower()
+    return tx_hash if tx_hash.startswith('0x') else '0x' + tx_hash
+
+def normalize_receipt(receipt):
+    # Receipt mentah dari JSON-RPC berisi string hex; field yang dipakai bot diubah ke int
+    receipt = dict(receipt)
+    for field in ('status', 'blockNumber', 'gasUsed', 'effectiveGasPrice'):
+        if isinstance(receipt.get(field), str):
+            receipt[field] = rpc_batch.to_int(receipt[field])
+    return receipt
+
+class ReceiptTracker:
+    # Satu loop polling per proses: eth_blockNumber sekali per interval, lalu
+    # eth_getBlockReceipts untuk tiap blok baru, dicocokkan ke semua hash yang ditunggu
+    def __init__(self, poll_interval=config.RECEIPT_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.waiters = {}  # hash -> list of Future
+        self.unchecked = set()  # hash baru yang belum pernah dicek langsung
+        self.last_block = None
+        self.block_receipts = True
+        self.task = None
+
+    async def wait(self, tx_hash, timeout=config.RECEIPT_TIMEOUT):
+        tx_hash = normalize_hash(tx_hash)
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(tx_hash, []).append(future)
+        self.unchecked.add(tx_hash)
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+        # wait() dipanggil tepat setelah transaksi dikirim, jadi durasinya adalah
+        # waktu dari kirim sampai masuk blok
+        start = time.monotonic()
+        try:
+            receipt = await asyncio.wait_for(future, timeout)
+            metrics.registry.observe('tx_inclusion_seconds', time.monotonic() - start, buckets=metrics.INCLUSION_BUCKETS)
+            metrics.registry.inc('tx_mined_total')
+            return receipt
+        except asyncio.TimeoutError:
+            metrics.registry.inc('tx_timeout_total')
+            raise
+        finally:
+            futures = self.waiters.get(tx_hash, [])
+            if future in futures:
+                futures.remove(future)
+            if not futures:
+                self.waiters.pop(tx_hash, None)
+                self.unchecked.discard(tx_hash)
+
+    async def run(self):
+        while self.waiters:
+            fresh = list(self.unchecked)
+            self.unchecked.clear()
+            try:
+                receipts = await asyncio.to_thread(self.poll, fresh, list(self.waiters))
+                self.resolve(receipts)
+            except Exception as e:
+                logger.warning(f"Error saat memeriksa blok baru: {e}")
+            if self.waiters:
+                await asyncio.sleep(self.poll_interval)
+        # Saat idle blok tidak dipantau; hash baru nanti dicek langsung lagi
+        self.last_block = None
+        self.task = None
+
+    def resolve(self, receipts):
+        for receipt in receipts:
+            tx_hash = normalize_hash(receipt['transactionHash'])
+            for future in self.waiters.pop(tx_hash, []):
+                if not future.done():
+                    future.set_result(normalize_receipt(receipt))
+            self.unchecked.discard(tx_hash)
+
+    def poll(self, fresh, waiting):
+        batcher = rpc_batch.RpcBatcher()
+        head_idx = batcher.add('eth_blockNumber', [])
+        # Hash yang baru didaftarkan dicek sekali langsung, karena bisa saja
+        # sudah tertambang di blok yang terlewat sebelum tracker berjalan
+        fresh_idx = [batcher.add('eth_getTransactionReceipt', [tx_hash]) for tx_hash in fresh]
+        results = batcher.execute()
+
+        receipts = [r for r in (results[i] for i in fresh_idx) if r]
+        head = rpc_batch.to_int(results[head_idx])
+        if head is None:
+            # eth_blockNumber gagal; blok baru diperiksa lagi pada interval berikutnya
+            return receipts
+        if self.last_block is None:
+            self.last_block = head - 1
+        if head <= self.last_block:
+            return receipts
+
+        blocks = range(self.last_block + 1, head + 1)
+        if self.block_receipts:
+            block_idx = [batcher.add('eth_getBlockReceipts', [hex(block)]) for block in blocks]
+            block_results = batcher.execute()
+            for i in block_idx:
+                if block_results[i] is None:
+                    break
+                receipts.extend(block_results[i])
+                self.last_block += 1
+            else:
+                return receipts
+            if not any(rpc_batch.is_method_not_found(batcher.errors.get(i)) for i in block_idx):
+                # Blok belum tersedia di node (mis. backend yang tertinggal) atau error sementara;
+                # blok yang gagal dicoba lagi pada poll berikutnya
+                metrics.log_sampled(
+                    logger, 'block_receipts_retry', "eth_getBlockReceipts blok %s gagal, dicoba lagi",
+                    self.last_block + 1, level=logging.WARNING,
+                )
+                return receipts
+            logger.warning("eth_getBlockReceipts tidak didukung node, beralih ke eth_getTransactionReceipt")
+            self.block_receipts = False
+
+        # Fallback: satu batch receipt untuk semua hash yang masih ditunggu per blok baru
+        pending = [tx_hash for tx_hash in waiting if tx_hash not in fresh]
+        pending_idx = [batcher.add('eth_getTransactionReceipt', [tx_hash]) for tx_hash in pending]
+        pending_results = batcher.execute()
+        receipts.extend(r for r in (pending_results[i] for i in pending_idx) if r)
+        self.last_block = head
+        return receipts
+
+tracker = ReceiptTracker()
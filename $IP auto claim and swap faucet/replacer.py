@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import config
+import fee_oracle
+import metrics
+import nonce_manager
+import receipt_tracker
+import signer
+import state_store
+
+logger = logging.getLogger(__name__)
+
+FEE_FIELDS = ('gasPrice', 'maxFeePerGas', 'maxPriorityFeePerGas')
+
+def fee_fields(tx):
+    return {field: tx[field] for field in FEE_FIELDS if field in tx}
+
+class Submission:
+    # Satu nonce milik satu akun beserta semua hash yang pernah dikirim untuknya
+    def __init__(self, account, tx, kind=None):
+        self.account = account
+        self.tx = tx
+        self.kind = kind
+        self.original_fees = fee_fields(tx)
+        self.hashes = []
+        self.sent_block = None
+        self.capped = False
+        self.waits = 0  # bertambah setiap submit ulang/wait(); dipakai untuk kedaluwarsa entri
+
+    @property
+    def nonce(self):
+        return self.tx['nonce']
+
+class ReplacementEngine:
+    # Transaksi yang belum masuk blok setelah REPLACE_AFTER_BLOCKS blok ditandatangani
+    # ulang dengan nonce yang sama dan fee yang dinaikkan, sampai batas FEE_MAX_MULTIPLIER.
+    # Blok terbaru dibaca dari pelacak receipt, jadi tidak ada polling tambahan.
+    def __init__(self, nonces=nonce_manager.manager, tracker=receipt_tracker.tracker, oracle=fee_oracle.oracle,
+                 store=state_store.store, after_blocks=config.REPLACE_AFTER_BLOCKS,
+                 expire_after=config.REPLACE_EXPIRE_AFTER):
+        self.nonces = nonces
+        self.tracker = tracker
+        self.oracle = oracle
+        self.store = store
+        self.after_blocks = after_blocks
+        self.expire_after = expire_after
+        self.outstanding = {}  # (alamat, nonce) -> Submission
+
+    async def submit(self, w3, account, tx, raw_tx=None, kind=None):
+        # Nonce yang masih menunggu (mis. percobaan ulang setelah timeout) memakai
+        # Submission yang sama: fee minimal naik sebesar syarat replacement dan
+        # hash lama tetap ditunggu karena bisa saja tetap tertambang
+        key = (account.address, tx['nonce'])
+        submission = self.outstanding.get(key)
+        if submission is None:
+            submission = self.outstanding[key] = Submission(account, tx, kind)
+        else:
+            submission.kind = kind
+            submission.waits += 1
+            # Batas FEE_MAX_MULTIPLIER yang sama dengan replace(): setelah tercapai,
+            # percobaan ulang hanya menunggu hash yang sudah ada
+            limit = {field: int(value * config.FEE_MAX_MULTIPLIER) for field, value in submission.original_fees.items()}
+            bumped = self.oracle.bump_from(fee_fields(submission.tx))
+            if any(value > limit.get(field, value) for field, value in bumped.items()):
+                submission.capped = True
+                logger.warning(
+                    f"Fee nonce {submission.nonce} untuk {account.address} sudah di batas maksimum, "
+                    f"menunggu hash yang ada tertambang"
+                )
+                return submission
+            fees = {
+                field: min(max(value, bumped.get(field, 0)), limit.get(field, value))
+                for field, value in fee_fields(tx).items()
+            }
+            if fees != fee_fields(tx):
+                raw_tx = None
+            submission.tx = {**tx, **fees}
+        try:
+            await self.send(w3, submission, raw_tx)
+        except Exception:
+            if not submission.hashes:
+                # Belum ada yang terkirim untuk nonce ini; tidak ada yang perlu ditunggu
+                self.outstanding.pop(key, None)
+            raise
+        return submission
+
+    async def send(self, w3, submission, raw_tx=None):
+        if raw_tx is None:
+            raw_tx, _ = await signer.sign(submission.account, submission.tx)
+        tx_hash = await w3.eth.send_raw_transaction(raw_tx)
+        self.nonces.mark_sent(submission.account.address, submission.nonce, tx_hash, submission.kind)
+        submission.hashes.append(tx_hash)
+        submission.sent_block = self.tracker.last_block
+        return tx_hash
+
+    async def wait(self, w3, submission, timeout=config.RECEIPT_TIMEOUT):
+        # Mengembalikan receipt dari hash mana pun yang akhirnya tertambang
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        tasks = {}
+        submission.waits += 1
+        try:
+            while True:
+                for tx_hash in submission.hashes:
+                    if tx_hash not in tasks:
+                        tasks[tx_hash] = asyncio.ensure_future(self.tracker.wait(tx_hash, timeout))
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                done, _ = await asyncio.wait(
+                    tasks.values(), timeout=min(self.tracker.poll_interval, remaining), return_when=asyncio.FIRST_COMPLETED
+                )
+                for tx_hash, task in tasks.items():
+                    if task in done and task.exception() is None:
+                        self.landed(submission, tx_hash)
+                        return task.result()
+                if all(task.done() for task in tasks.values()):
+                    raise asyncio.TimeoutError()
+                if self.is_stuck(submission):
+                    await self.replace(w3, submission)
+        finally:
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+            # Pemanggil berhenti menunggu (timeout/cancel); entri dilupakan jika
+            # tidak ada submit atau wait baru sebelum REPLACE_EXPIRE_AFTER
+            loop.call_later(self.expire_after, self.expire, submission, submission.waits)
+
+    def expire(self, submission, waits):
+        key = (submission.account.address, submission.nonce)
+        if submission.waits == waits and self.outstanding.get(key) is submission:
+            del self.outstanding[key]
+
+    def is_stuck(self, submission):
+        block = self.tracker.last_block
+        if block is None or submission.capped:
+            return False
+        if submission.sent_block is None:
+            # Tracker belum membaca blok saat transaksi dikirim; tenggat dihitung dari sekarang
+            submission.sent_block = block
+            return False
+        return block - submission.sent_block >= self.after_blocks
+
+    async def replace(self, w3, submission):
+        fees = await asyncio.to_thread(self.oracle.bump, fee_fields(submission.tx), submission.original_fees)
+        if fees is None:
+            submission.capped = True
+            logger.warning(
+                f"Fee nonce {submission.nonce} untuk {submission.account.address} sudah di batas maksimum, "
+                f"menunggu hash yang ada tertambang"
+            )
+            return
+        previous = submission.tx
+        submission.tx = {**previous, **fees}
+        try:
+            tx_hash = await self.send(w3, submission)
+        except Exception as e:
+            # "nonce too low" berarti salah satu hash sudah tertambang dan receipt-nya
+            # akan datang dari tracker; error lain dicoba lagi setelah tenggat berikutnya
+            submission.tx = previous
+            submission.sent_block = self.tracker.last_block
+            logger.warning(f"Gagal mengganti nonce {submission.nonce} untuk {submission.account.address}: {e}")
+            return
+        metrics.registry.inc('tx_replaced_total', submission.kind)
+        logger.info(
+            f"Transaksi {submission.kind} nonce {submission.nonce} untuk {submission.account.address} macet, "
+            f"diganti dengan fee lebih tinggi. Hash: {tx_hash.hex()}"
+        )
+
+    def landed(self, submission, tx_hash):
+        address = submission.account.address
+        self.outstanding.pop((address, submission.nonce), None)
+        self.nonces.mark_mined(address, submission.nonce)
+        if self.store:
+            self.store.mark_landed(address, submission.nonce, tx_hash)
+        if len(submission.hashes) > 1:
+            logger.info(
+                f"Nonce {submission.nonce} untuk {address} tertambang dengan hash {tx_hash.hex()} "
+                f"setelah {len(submission.hashes) - 1} penggantian"
+            )
+
+engine = ReplacementEngine()
@@ -0,0 +1,110 @@
+import logging
+from web3 import Web3
+import config
+import contracts
+import rpc_pool
+
+logger = logging.getLogger(__name__)
+
+# Selector view token, dipakai juga oleh multicall
+BALANCE_OF_SELECTOR = Web3.keccak(text="balanceOf(address)")[:4]
+ALLOWANCE_SELECTOR = Web3.keccak(text="allowance(address,address)")[:4]
+LAST_CLAIM_TIME_SELECTOR = Web3.keccak(text="lastClaimTime(address)")[:4]
+
+def encode_address(address):
+    return bytes.fromhex(contracts.checksum(address)[2:].rjust(64, '0'))
+
+# Kode JSON-RPC untuk method yang tidak dikenal node
+METHOD_NOT_FOUND = -32601
+
+def is_method_not_found(error):
+    if not error:
+        return False
+    # Pesan saja tidak cukup: "header not found" dari geth adalah error sementara
+    message = str(error.get('message', '')).lower()
+    return error.get('code') == METHOD_NOT_FOUND or (
+        'method' in message and any(text in message for text in ('not found', 'not supported', 'does not exist'))
+    )
+
+def to_int(result):
+    # None (request gagal) dan '0x' (eth_call tanpa data) berarti nilainya tidak
+    # diketahui, bukan nol; pemanggil harus melewati atau mengulang pembacaan itu
+    if result is None or result == '0x':
+        return None
+    return int(result, 16)
+
+class RpcBatcher:
+    def __init__(self, pool=None, batch_size=config.RPC_BATCH_SIZE):
+        self.pool = pool or rpc_pool.pool
+        self.batch_size = batch_size
+        self.calls = []
+        self.errors = {}  # index request -> objek error JSON-RPC dari execute() terakhir
+
+    def add(self, method, params):
+        self.calls.append((method, params))
+        return len(self.calls) - 1
+
+    def add_call(self, to, data, block='latest'):
+        if isinstance(data, (bytes, bytearray)):
+            data = Web3.to_hex(data)
+        return self.add('eth_call', [{'to': to, 'data': data}, block])
+
+    def execute(self):
+        results = [None] * len(self.calls)
+        self.errors = {}
+        for start in range(0, len(self.calls), self.batch_size):
+            chunk = self.calls[start:start + self.batch_size]
+            payload = [
+                {"jsonrpc": "2.0", "id": start + i, "method": method, "params": params}
+                for i, (method, params) in enumerate(chunk)
+            ]
+            data = self.pool.post(payload)
+            if not isinstance(data, list):
+                raise Exception(f"Batch request ditolak oleh node: {data}")
+            for item in data:
+                if 'error' in item:
+                    logger.warning(f"Error pada request {chunk[item['id'] - start][0]}: {item['error']}")
+                    self.errors[item['id']] = item['error']
+                    continue
+                results[item['id']] = item.get('result')
+        self.calls = []
+        return results
+
+def snapshot_state(addresses, token_addresses, spender_address=None, batcher=None):
+    batcher = batcher or RpcBatcher()
+    addresses = [contracts.checksum(a) for a in addresses]
+    token_addresses = [contracts.checksum(t) for t in token_addresses]
+
+    indexes = {}
+    for address in addresses:
+        balance_idx = batcher.add('eth_getBalance', [address, 'latest'])
+        nonce_idx = batcher.add('eth_getTransactionCount', [address, 'pending'])
+        token_idx = {}
+        for token in token_addresses:
+            token_balance_idx = batcher.add_call(token, BALANCE_OF_SELECTOR + encode_address(address))
+            last_claim_idx = batcher.add_call(token, LAST_CLAIM_TIME_SELECTOR + encode_address(address))
+            allowance_idx = None
+            if spender_address:
+                allowance_idx = batcher.add_call(
+                    token, ALLOWANCE_SELECTOR + encode_address(address) + encode_address(spender_address)
+                )
+            token_idx[token] = (token_balance_idx, last_claim_idx, allowance_idx)
+        indexes[address] = (balance_idx, nonce_idx, token_idx)
+
+    results = batcher.execute()
+
+    state = {'accounts': {}}
+    for address, (balance_idx, nonce_idx, token_idx) in indexes.items():
+        tokens = {}
+        for token, (token_balance_idx, last_claim_idx, allowance_idx) in token_idx.items():
+            tokens[token] = {
+                'balance': to_int(results[token_balance_idx]),
+                'last_claim': to_int(results[last_claim_idx]),
+                'allowance': to_int(results[allowance_idx]) if allowance_idx is not None else None,
+            }
+        state['accounts'][address] = {
+            'balance': to_int(results[balance_idx]),
+            'nonce': to_int(results[nonce_idx]),
+            'tokens': tokens,
+        }
+    return state
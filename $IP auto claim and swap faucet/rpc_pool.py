@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import AsyncWeb3
+from web3.providers.async_base import AsyncBaseProvider
+import config
+import metrics
+from rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+class Endpoint:
+    def __init__(self, url, pool_size=config.RPC_POOL_CONNECTIONS):
+        self.url = url
+        # Session dengan koneksi keep-alive untuk request sinkron (JSON-RPC batch)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.latency = None  # rata-rata bergerak (EWMA) dalam detik
+        self.error_rate = 0.0
+        self.down_until = 0
+        self.lock = threading.Lock()
+        self.limiter = RateLimiter()
+
+    def record(self, latency=None, error=False, throttled=False, alpha=config.RPC_HEALTH_ALPHA):
+        if throttled:
+            self.limiter.on_throttle()
+        elif not error:
+            self.limiter.on_success()
+        with self.lock:
+            self.error_rate = (1 - alpha) * self.error_rate + alpha * (1 if error else 0)
+            if error:
+                self.down_until = time.monotonic() + config.RPC_COOLDOWN
+            elif latency is not None:
+                self.latency = latency if self.latency is None else (1 - alpha) * self.latency + alpha * latency
+
+    def score(self):
+        # Semakin kecil semakin sehat; endpoint yang belum pernah dipakai dianggap cepat
+        return (self.latency or 0) * (1 + 10 * self.error_rate) + self.error_rate
+
+    def is_down(self):
+        return time.monotonic() < self.down_until
+
+def is_rate_limit_error(error):
+    # Sebagian node membalas rate limit di dalam JSON-RPC (HTTP 200), bukan dengan 429
+    if not isinstance(error, dict):
+        return False
+    message = str(error.get('message', '')).lower()
+    return error.get('code') == -32005 or any(text in message for text in ('limit exceeded', 'rate limit', 'too many requests'))
+
+def is_rate_limited(data):
+    items = data if isinstance(data, list) else [data]
+    return any(isinstance(item, dict) and is_rate_limit_error(item.get('error')) for item in items)
+
+def is_throttle(error):
+    # 429 atau timeout berarti node kewalahan; laju request harus diturunkan
+    status = getattr(error, 'status', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    return status == 429 or isinstance(error, (asyncio.TimeoutError, requests.Timeout)) or 'Timeout' in type(error).__name__
+
+class RpcPool:
+    def __init__(self, urls=config.RPC_URLS):
+        self.endpoints = [Endpoint(url) for url in urls]
+
+    def rate(self):
+        # Kapasitas request per detik saat ini, dipakai scheduler sebagai backpressure.
+        # Endpoint yang sedang cooldown tetap dihitung pada laju limiter-nya: error
+        # biasa tidak menurunkan kapasitas, hanya 429/timeout yang memotong laju
+        return sum(ep.limiter.rate for ep in self.endpoints) or config.RATE_LIMIT_MIN
+
+    def ranked(self):
+        # Endpoint yang sedang cooldown tetap dicoba paling akhir sebagai cadangan
+        return sorted(self.endpoints, key=lambda ep: (ep.is_down(), ep.score()))
+
+    def post(self, payload, timeout=config.RPC_TIMEOUT):
+        last_error = None
+        # Limiter dihitung per request HTTP: satu batch berisi ratusan panggilan
+        # tetap satu token, jadi batch besar tidak menunggu puluhan detik
+        size = len(payload) if isinstance(payload, list) else 1
+        method = 'batch' if isinstance(payload, list) else payload.get('method')
+        # Method per id item agar metrik batch tetap terhitung per method
+        methods = {item['id']: item.get('method') for item in payload} if isinstance(payload, list) else None
+        for endpoint in self.ranked():
+            endpoint.limiter.acquire()
+            start = time.monotonic()
+            try:
+                response = endpoint.session.post(endpoint.url, json=payload, timeout=timeout)
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+                response.raise_for_status()
+                data = response.json()
+            except (requests.RequestException, ValueError) as e:
+                if methods is not None:
+                    metrics.registry.rpc_batch(methods.values(), time.monotonic() - start, errors=methods.values())
+                else:
+                    metrics.registry.rpc(method, time.monotonic() - start, error=True)
+                metrics.registry.inc('rpc_failover_total', method)
+                endpoint.record(error=True, throttled=is_throttle(e))
+                logger.warning(f"Endpoint {endpoint.url} gagal: {e}, beralih ke endpoint lain")
+                last_error = e
+                continue
+            latency = time.monotonic() - start
+            # Item yang terkena rate limit in-band kembali sebagai error (None bagi pemanggil),
+            # tetapi lajunya tetap diturunkan seperti 429
+            endpoint.record(latency, throttled=is_rate_limited(data))
+            if methods is not None:
+                errors = [methods.get(item.get('id')) for item in data if isinstance(item, dict) and 'error' in item] \
+                    if isinstance(data, list) else methods.values()
+                metrics.registry.rpc_batch(methods.values(), latency, errors)
+                metrics.registry.inc('rpc_batched_requests_total', value=size)
+            else:
+                metrics.registry.rpc(method, latency, error=isinstance(data, dict) and 'error' in data)
+            return data
+        raise Exception(f"Semua endpoint RPC gagal: {last_error}")
+
+class PooledAsyncProvider(AsyncBaseProvider):
+    # Provider AsyncWeb3 yang memilih endpoint tersehat untuk pembacaan dan
+    # menyiarkan eth_sendRawTransaction ke beberapa endpoint sekaligus
+    def __init__(self, pool, broadcast_count=config.RPC_BROADCAST_COUNT):
+        super().__init__()
+        self.pool = pool
+        self.broadcast_count = broadcast_count
+        self.providers = {
+            endpoint.url: AsyncWeb3.AsyncHTTPProvider(endpoint.url, request_kwargs={'timeout': config.RPC_TIMEOUT})
+            for endpoint in pool.endpoints
+        }
+
+    async def send(self, endpoint, method, params):
+        await endpoint.limiter.async_acquire()
+        start = time.monotonic()
+        try:
+            response = await self.providers[endpoint.url].make_request(method, params)
+        except Exception as e:
+            metrics.registry.rpc(method, time.monotonic() - start, error=True)
+            endpoint.record(error=True, throttled=is_throttle(e))
+            raise
+        latency = time.monotonic() - start
+        endpoint.record(latency, throttled=is_rate_limited(response))
+        metrics.registry.rpc(method, latency, error='error' in response)
+        return response
+
+    async def make_request(self, method, params):
+        if method == 'eth_sendRawTransaction':
+            return await self.broadcast(method, params)
+        last_error = None
+        for endpoint in self.pool.ranked():
+            try:
+                return await self.send(endpoint, method, params)
+            except Exception as e:
+                logger.warning(f"Endpoint {endpoint.url} gagal untuk {method}: {e}, beralih ke endpoint lain")
+                metrics.registry.inc('rpc_failover_total', method)
+                last_error = e
+        raise last_error
+
+    async def broadcast(self, method, params):
+        targets = self.pool.ranked()[:self.broadcast_count]
+        responses = await asyncio.gather(*(self.send(ep, method, params) for ep in targets), return_exceptions=True)
+        # Ambil respons sukses pertama; error "already known" dari endpoint lain diabaikan
+        valid = [r for r in responses if not isinstance(r, Exception)]
+        for response in valid:
+            if 'error' not in response:
+                return response
+        if valid:
+            return valid[0]
+        raise responses[0]
+
+    async def is_connected(self, show_traceback=False):
+        try:
+            response = await self.make_request('web3_clientVersion', [])
+            return 'result' in response
+        except Exception:
+            if show_traceback:
+                raise
+            return False
+
+pool = RpcPool()
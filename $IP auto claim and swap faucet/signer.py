@@ -0,0 +1,35 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from eth_account import Account
+import config
+import metrics
+
+_executor = None
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=config.SIGNER_WORKERS)
+    return _executor
+
+def sign_chunk(chunk):
+    # Dijalankan di proses worker: ECDSA + RLP tidak lagi memegang GIL proses utama
+    signed = []
+    for key, tx in chunk:
+        signed_tx = Account.sign_transaction(tx, key)
+        signed.append((bytes(signed_tx.raw_transaction), bytes(signed_tx.hash)))
+    return signed
+
+async def sign_batch(items, chunk_size=config.SIGNER_CHUNK_SIZE):
+    # items: list of (account, tx dict lengkap). Mengembalikan list of (raw_tx, tx_hash)
+    if not items:
+        return []
+    loop = asyncio.get_running_loop()
+    payload = [(bytes(account.key), tx) for account, tx in items]
+    chunks = [payload[i:i + chunk_size] for i in range(0, len(payload), chunk_size)]
+    with metrics.timer('stage_seconds', 'sign'):
+        results = await asyncio.gather(*(loop.run_in_executor(executor(), sign_chunk, chunk) for chunk in chunks))
+    return [signed for chunk in results for signed in chunk]
+
+async def sign(account, tx):
+    return (await sign_batch([(account, tx)]))[0]
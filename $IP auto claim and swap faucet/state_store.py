@@ -0,0 +1,171 @@
+import logging
+import sqlite3
+import threading
+import time
+import config
+import rpc_batch
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    hash TEXT PRIMARY KEY,
+    address TEXT NOT NULL,
+    nonce INTEGER NOT NULL,
+    kind TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    sent_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_pending ON transactions (status, address, nonce);
+CREATE TABLE IF NOT EXISTS claims (
+    address TEXT NOT NULL,
+    token TEXT NOT NULL,
+    eligible_at REAL NOT NULL,
+    PRIMARY KEY (address, token)
+);
+CREATE TABLE IF NOT EXISTS swaps (
+    round TEXT NOT NULL,
+    address TEXT NOT NULL,
+    token TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (round, address, token)
+);
+CREATE TABLE IF NOT EXISTS transfers (
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    block INTEGER NOT NULL,
+    token TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE INDEX IF NOT EXISTS transfers_recipient ON transfers (recipient, token);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def to_hex(tx_hash):
+    if isinstance(tx_hash, (bytes, bytearray)):
+        return '0x' + bytes(tx_hash).hex()
+    return tx_hash if tx_hash.startswith('0x') else '0x' + tx_hash
+
+class StateStore:
+    # SQLite dalam mode WAL; penulisan dikumpulkan lalu di-commit per batch
+    # agar hot path tidak menunggu fsync untuk setiap transaksi
+    def __init__(self, path=config.STATE_DB_PATH, flush_size=config.STATE_FLUSH_SIZE):
+        self.path = path
+        self.flush_size = flush_size
+        self.lock = threading.Lock()
+        self.pending = []
+        self.conn = None
+
+    def connect(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(SCHEMA)
+        return self.conn
+
+    def queue(self, sql, params):
+        with self.lock:
+            self.pending.append((sql, params))
+            full = len(self.pending) >= self.flush_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            writes, self.pending = self.pending, []
+            if not writes:
+                return
+            conn = self.connect()
+            with conn:
+                for sql, params in writes:
+                    conn.execute(sql, params)
+
+    def query(self, sql, params=()):
+        self.flush()
+        with self.lock:
+            return self.connect().execute(sql, params).fetchall()
+
+    def record_tx(self, tx_hash, address, nonce, kind=None):
+        self.queue(
+            "INSERT OR REPLACE INTO transactions (hash, address, nonce, kind, status, sent_at) VALUES (?, ?, ?, ?, 'pending', ?)",
+            (to_hex(tx_hash), address, nonce, kind, time.time()),
+        )
+
+    def mark_mined(self, address, nonce):
+        # Semua hash dengan nonce <= nonce yang tertambang sudah selesai (tertambang atau tergantikan)
+        self.queue(
+            "UPDATE transactions SET status = 'done' WHERE address = ? AND nonce <= ? AND status = 'pending'",
+            (address, nonce),
+        )
+
+    def mark_landed(self, address, nonce, tx_hash):
+        # Dari semua hash untuk satu nonce, hanya yang tertambang ditandai 'landed'
+        self.queue(
+            "UPDATE transactions SET status = CASE WHEN hash = ? THEN 'landed' ELSE 'replaced' END WHERE address = ? AND nonce = ?",
+            (to_hex(tx_hash), address, nonce),
+        )
+
+    def pending_transactions(self):
+        return self.query("SELECT hash, address, nonce, kind FROM transactions WHERE status = 'pending' ORDER BY address, nonce")
+
+    def reconcile(self, batcher=None):
+        # Dipanggil saat startup: hash yang tertinggal dari proses sebelumnya dicek
+        # sekaligus dalam satu JSON-RPC batch, yang sudah tertambang ditandai selesai
+        pending = self.pending_transactions()
+        if not pending:
+            return []
+        batcher = batcher or rpc_batch.RpcBatcher()
+        indexes = [batcher.add('eth_getTransactionReceipt', [tx_hash]) for tx_hash, _, _, _ in pending]
+        results = batcher.execute()
+        remaining = []
+        for (tx_hash, address, nonce, kind), idx in zip(pending, indexes):
+            if results[idx]:
+                self.mark_mined(address, nonce)
+            else:
+                remaining.append((tx_hash, address, nonce, kind))
+        self.flush()
+        logger.info(f"Rekonsiliasi {len(pending)} transaksi tertunda: {len(pending) - len(remaining)} sudah tertambang")
+        return remaining
+
+    def set_claim(self, address, token, eligible_at):
+        self.queue(
+            "INSERT OR REPLACE INTO claims (address, token, eligible_at) VALUES (?, ?, ?)",
+            (address, token, eligible_at),
+        )
+
+    def claim_schedule(self):
+        return {(address, token): eligible_at for address, token, eligible_at in self.query("SELECT address, token, eligible_at FROM claims")}
+
+    def set_swap_stage(self, round_id, address, token, stage):
+        self.queue(
+            "INSERT OR REPLACE INTO swaps (round, address, token, stage, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (round_id, address, token, stage, time.time()),
+        )
+
+    def swap_stages(self, round_id):
+        rows = self.query("SELECT address, token, stage FROM swaps WHERE round = ?", (round_id,))
+        return {(address, token): stage for address, token, stage in rows}
+
+    def record_transfer(self, block, tx_hash, log_index, token, sender, recipient, value):
+        # value disimpan sebagai teks karena uint256 melebihi batas INTEGER SQLite
+        self.queue(
+            "INSERT OR REPLACE INTO transfers (tx_hash, log_index, block, token, sender, recipient, value) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (to_hex(tx_hash), log_index, block, token, sender, recipient, str(value)),
+        )
+
+    def set_meta(self, key, value):
+        self.queue("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def get_meta(self, key):
+        rows = self.query("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0][0] if rows else None
+
+store = StateStore()
@@ -1,7 +1,20 @@
 import logging
 import time
-from web3 import Web3
+from web3 import AsyncWeb3
 import config
+import multicall
+import rpc_pool
+import contracts
+import quoter
+import nonce_manager
+import rate_limiter
+import fee_oracle
+import replacer
+import state_store
+import keystore
+import signer
+import receipt_logs
+import metrics
 from datetime import datetime, timedelta
 from web3.exceptions import ABIFunctionNotFound, ContractLogicError
 import asyncio
@@ -9,121 +22,93 @@ import asyncio
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# ABI untuk router kontrak
-ROUTER_ABI = [
-    {
-        "inputs": [
-            {"internalType": "uint256", "name": "amountIn", "type": "uint256"},
-            {"internalType": "uint256", "name": "amountOutMin", "type": "uint256"},
-            {"internalType": "address[]", "name": "path", "type": "address[]"},
-            {"internalType": "address", "name": "to", "type": "address"},
-            {"internalType": "uint256", "name": "deadline", "type": "uint256"}
-        ],
-        "name": "swapExactTokensForETH",
-        "outputs": [{"internalType": "uint256[]", "name": "amounts", "type": "uint256[]"}],
-        "stateMutability": "nonpayable",
-        "type": "function"
-    },
-    {
-        "inputs": [],
-        "name": "WETH",
-        "outputs": [{"internalType": "address", "name": "", "type": "address"}],
-        "stateMutability": "view",
-        "type": "function"
-    }
-]
-
 ROUTER_ADDRESS = config.ROUTER_ADDRESS
+# Tahap swap yang tidak perlu diulang saat melanjutkan putaran
+FINISHED_STAGES = ('swapped', 'skipped')
 MAX_UINT256 = 2**256 - 1
 
-def setup_web3():
-    w3 = Web3(Web3.HTTPProvider(config.RPC_URL))
-    if not w3.is_connected():
-        logger.error(f"Tidak dapat terhubung ke node: {config.RPC_URL}")
+async def setup_web3():
+    w3 = AsyncWeb3(rpc_pool.PooledAsyncProvider(rpc_pool.pool))
+    if not await w3.is_connected():
+        logger.error(f"Tidak dapat terhubung ke node: {config.RPC_URLS}")
         raise Exception("Koneksi ke node gagal")
-    logger.info(f"Terhubung ke node: {config.RPC_URL}")
-    accounts = [w3.eth.account.from_key(pk) for pk in config.PRIVATE_KEYS]
+    logger.info(f"Terhubung ke node: {config.RPC_URLS}")
+    accounts = await asyncio.to_thread(keystore.load_accounts)
     return w3, accounts
 
-def get_token_balance(w3, token_address, account_address):
-    token_contract = w3.eth.contract(address=Web3.to_checksum_address(token_address), abi=config.SUDT_ABI)
-    try:
-        balance = token_contract.functions.balanceOf(account_address).call()
-        return balance
-    except Exception as e:
-        logger.error(f"Error saat mengambil saldo token {token_address}: {str(e)}")
-        return 0
-
-def check_allowance(w3, token_address, owner_address, spender_address):
-    token_contract = w3.eth.contract(address=Web3.to_checksum_address(token_address), abi=config.SUDT_ABI)
+async def check_allowance(w3, token_address, owner_address, spender_address):
+    token_contract = contracts.registry(w3).token(token_address)
     try:
-        allowance = token_contract.functions.allowance(owner_address, spender_address).call()
-        logger.info(f"Current allowance for {token_address}: {allowance}")
+        allowance = await token_contract.functions.allowance(owner_address, spender_address).call()
+        logger.info("Current allowance for %s: %s", token_address, allowance)
         return allowance
     except ABIFunctionNotFound:
         logger.warning(f"Allowance function not found for {token_address}. Assuming no allowance.")
         return 0
 
-def get_dynamic_gas_price(w3, multiplier=1.1):
-    gas_price = w3.eth.gas_price
-    return int(gas_price * multiplier)
-
-def approve_token(w3, account, token_address, spender_address):
-    current_allowance = check_allowance(w3, token_address, account.address, spender_address)
+async def approve_token(w3, account, token_address, spender_address, send_lock, current_allowance=None, nonces=nonce_manager.manager, presigned=None):
+    if current_allowance is None:
+        current_allowance = await check_allowance(w3, token_address, account.address, spender_address)
     if current_allowance >= MAX_UINT256 // 2:
         logger.info(f"Allowance already sufficient for {token_address}")
         return True
 
-    token_contract = w3.eth.contract(address=Web3.to_checksum_address(token_address), abi=config.SUDT_ABI)
+    token_contract = contracts.registry(w3).token(token_address)
 
+    nonce = None
     try:
-        nonce = w3.eth.get_transaction_count(account.address, 'pending')
-        gas_price = get_dynamic_gas_price(w3)
-
-        tx = token_contract.functions.approve(Web3.to_checksum_address(spender_address), MAX_UINT256).build_transaction({
-            'from': account.address,
-            'nonce': nonce,
-            'gas': 200000,
-            'gasPrice': gas_price
-        })
-
-        signed_tx = account.sign_transaction(tx)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-
-        if receipt['status'] == 1:
-            logger.info(f"Infinite approval successful for {token_address}")
+        # Approval dikirim berurutan per akun, konfirmasinya ditunggu di luar lock
+        async with send_lock:
+            raw_tx = None
+            if presigned is not None:
+                tx, raw_tx = presigned
+                nonce = tx['nonce']
+            else:
+                if not nonces.is_synced(account.address):
+                    nonces.sync(account.address, await w3.eth.get_transaction_count(account.address, 'pending'))
+                nonce = nonces.reserve(account.address)
+                fees = await fee_oracle.oracle.async_fees()
+
+                tx = await token_contract.functions.approve(contracts.checksum(spender_address), MAX_UINT256).build_transaction({
+                    'from': account.address,
+                    'nonce': nonce,
+                    'gas': 200000,
+                    **fees
+                })
+
+            submission = await replacer.engine.submit(w3, account, tx, raw_tx, 'approve')
+        receipt = await wait_receipt(w3, submission)
+        if receipt is not None:
+            nonce = None
+
+        if receipt is not None and receipt['status'] == 1:
+            metrics.log_sampled(logger, 'approve_ok', "Infinite approval successful for %s", token_address)
             return True
         else:
             logger.error(f"Approval failed for {token_address}")
             return False
     except Exception as e:
         logger.warning(f"Error during approval for {token_address}: {str(e)}")
+        if nonce is not None and nonce not in nonces.pending(account.address):
+            nonces.release(account.address, nonce)
         return False
 
-async def confirm_transaction(w3, tx_hash, max_attempts=60):
-    for attempt in range(max_attempts):
-        try:
-            receipt = w3.eth.get_transaction_receipt(tx_hash)
-            if receipt is not None:
-                if receipt['status'] == 1:
-                    return True
-                else:
-                    logger.error(f"Transaksi gagal: {tx_hash.hex()}")
-                    return False
-        except Exception as e:
-            logger.warning(f"Error saat memeriksa receipt (attempt {attempt + 1}/{max_attempts}): {str(e)}")
-        await asyncio.sleep(2)  # Tunggu 2 detik sebelum mencoba lagi
-    logger.error(f"Tidak ada konfirmasi untuk transaksi {tx_hash.hex()} setelah {max_attempts} percobaan")
-    return False
+async def wait_receipt(w3, submission, timeout=config.RECEIPT_TIMEOUT):
+    # Receipt dari hash mana pun yang tertambang; transaksi yang macet diganti
+    # oleh replacer dengan nonce sama dan fee lebih tinggi
+    try:
+        return await replacer.engine.wait(w3, submission, timeout)
+    except asyncio.TimeoutError:
+        logger.error(f"Tidak ada konfirmasi untuk transaksi {submission.hashes[-1].hex()} setelah {timeout} detik")
+        return None
 
 async def check_router_contract(w3, router_address):
     try:
         logger.info(f"Memeriksa kontrak router di alamat: {router_address}")
-        router_contract = w3.eth.contract(address=router_address, abi=ROUTER_ABI)
+        router_contract = contracts.registry(w3).router(router_address)
         logger.info("Kontrak router berhasil dibuat")
 
-        bytecode = w3.eth.get_code(router_address)
+        bytecode = await w3.eth.get_code(router_address)
         if bytecode == b'':
             logger.error("Tidak ada bytecode di alamat kontrak yang diberikan")
             return False
@@ -132,7 +117,7 @@ async def check_router_contract(w3, router_address):
 
         logger.info("Mencoba memanggil fungsi WETH()")
         try:
-            weth_address = router_contract.functions.WETH().call()
+            weth_address = await contracts.registry(w3).weth(router_address)
             logger.info(f"Router contract verified. WETH address: {weth_address}")
         except ContractLogicError as cle:
             logger.error(f"Kesalahan logika kontrak: {str(cle)}")
@@ -147,131 +132,254 @@ async def check_router_contract(w3, router_address):
         logger.error(f"Error args: {e.args}")
         return False
 
-async def swap_token_with_retry(w3, account, token_address, amount, max_retries=5):
-    router_contract = w3.eth.contract(address=ROUTER_ADDRESS, abi=ROUTER_ABI)
+async def swap_token_with_retry(w3, account, token_address, amount, send_lock, max_retries=5, known_state=None, quote=None, nonces=nonce_manager.manager):
+    # Mengembalikan jumlah token yang ditukar jika berhasil, False jika gagal
+    registry = contracts.registry(w3)
+    router_contract = registry.router(ROUTER_ADDRESS)
 
-    weth_address = router_contract.functions.WETH().call()
-    path = [Web3.to_checksum_address(token_address), weth_address]
+    # WETH() tidak pernah berubah, cukup dibaca sekali per proses
+    weth_address = await registry.weth(ROUTER_ADDRESS)
+    path = [contracts.checksum(token_address), weth_address]
     deadline = int(time.time()) + 600  # 10 menit dari sekarang
 
+    if not nonces.is_synced(account.address):
+        nonces.sync(account.address, await w3.eth.get_transaction_count(account.address, 'pending'))
+    nonce = None
     for attempt in range(max_retries):
+        if attempt > 0:
+            metrics.registry.inc('retries_total', 'swap')
         try:
-            ckb_balance = w3.eth.get_balance(account.address)
-            logger.info(f"Saldo CKB sebelum swap: {ckb_balance}")
+            # Percobaan pertama memakai saldo dari snapshot batch, retry membaca ulang
+            # saldo native saja untuk memastikan gas masih cukup
+            if known_state is not None:
+                ckb_balance, balance_before = known_state
+                known_state = None
+                logger.debug("Saldo sebelum swap - %s: %s, IP (CKB): %s", token_address, balance_before, ckb_balance)
+            else:
+                ckb_balance = await w3.eth.get_balance(account.address)
+            logger.debug("Saldo CKB sebelum swap: %s", ckb_balance)
             if ckb_balance < 1e16:  # 0.01 CKB
                 logger.error(f"Saldo CKB tidak cukup untuk swap: {ckb_balance}")
                 return False
 
-            balance_before = get_token_balance(w3, token_address, account.address)
-            ip_balance_before = w3.eth.get_balance(account.address)
-            logger.info(f"Saldo sebelum swap - {token_address}: {balance_before}, IP (CKB): {ip_balance_before}")
-
-            nonce = w3.eth.get_transaction_count(account.address, 'pending')
-            gas_price = get_dynamic_gas_price(w3)
-
-            # Penanganan khusus untuk WETH
-            if token_address == config.TOKEN_ADDRESSES['WETH']:
-                original_amount = amount
-                for i in range(5):  # Coba hingga 5 kali dengan jumlah yang semakin kecil
-                    amount = original_amount // (2**i)
-                    amount_out_min = int(amount * 0.01)  # 99% slippage untuk WETH
-                    logger.info(f"WETH swap attempt {i+1}: amount={amount}, amount_out_min={amount_out_min}")
-
-                    try:
-                        gas_estimate = router_contract.functions.swapExactTokensForETH(
-                            amount, amount_out_min, path, account.address, deadline
-                        ).estimate_gas({'from': account.address})
-                        logger.info(f"Gas estimate successful for WETH: {gas_estimate}")
-                        break
-                    except ContractLogicError as e:
-                        logger.warning(f"WETH swap attempt {i+1} failed. Error: {str(e)}")
-                        if i == 4:  # Jika ini percobaan terakhir, raise error
-                            raise
-                        logger.warning("Trying with smaller amount.")
-            else:
-                amount_out_min = int(amount * 0.95)  # 5% slippage untuk token lain
-                gas_estimate = router_contract.functions.swapExactTokensForETH(
-                    amount, amount_out_min, path, account.address, deadline
-                ).estimate_gas({'from': account.address})
+            fees = await fee_oracle.oracle.async_fees(attempt)
+
+            # Quote getAmountsOut menentukan jumlah terbesar yang bisa dieksekusi dan
+            # min-out yang sebenarnya; simulasi cukup satu kali lewat estimate_gas
+            if quote is None:
+                quotes = await asyncio.to_thread(quoter.quote_swaps, [(token_address, amount)], weth_address)
+                quote = quotes[(token_address, amount)]
+            if quote is None:
+                logger.error(f"Tidak ada rute swap untuk {token_address} sejumlah {amount}")
+                return False
+            amount_in, amount_out_min = quote
+            quote = None  # percobaan ulang selalu memakai quote baru
 
-            logger.info(f"Mencoba swap dengan parameter: amount={amount}, amount_out_min={amount_out_min}, path={path}, to={account.address}, deadline={deadline}")
-            logger.info(f"Estimasi gas: {gas_estimate}")
+            gas_estimate = await router_contract.functions.swapExactTokensForETH(
+                amount_in, amount_out_min, path, account.address, deadline
+            ).estimate_gas({'from': account.address})
+
+            logger.debug("Mencoba swap dengan parameter: amount=%s, amount_out_min=%s, path=%s, to=%s, deadline=%s, gas=%s",
+                         amount_in, amount_out_min, path, account.address, deadline, gas_estimate)
 
             gas_limit = int(gas_estimate * 1.5)  # Tambahkan 50% ke estimasi gas
 
-            tx = router_contract.functions.swapExactTokensForETH(
-                amount,
-                amount_out_min,
-                path,
-                account.address,
-                deadline
-            ).build_transaction({
-                'from': account.address,
-                'nonce': nonce,
-                'gas': gas_limit,
-                'gasPrice': gas_price
-            })
-
-            logger.info(f"Transaction built: {tx}")
-
-            signed_tx = account.sign_transaction(tx)
-            tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-            logger.info(f"Transaksi swap terkirim. Hash: {tx_hash.hex()}")
-            logger.info(f"Silakan periksa transaksi di explorer: https://testnet.storyscan.xyz/tx/{tx_hash.hex()}")
-
-            confirmation = await confirm_transaction(w3, tx_hash)
-            if confirmation:
-                balance_after = get_token_balance(w3, token_address, account.address)
-                ip_balance_after = w3.eth.get_balance(account.address)
-                logger.info(f"Swap berhasil. Saldo setelah swap - {token_address}: {balance_after}, IP (CKB): {ip_balance_after}")
-                return True
+            async with send_lock:
+                # Swap yang belum terkonfirmasi digantikan dengan nonce yang sama,
+                # bukan ditumpuk di belakangnya dengan nonce baru
+                if nonce is None:
+                    nonce = nonces.reserve(account.address)
+                tx = await router_contract.functions.swapExactTokensForETH(
+                    amount_in,
+                    amount_out_min,
+                    path,
+                    account.address,
+                    deadline
+                ).build_transaction({
+                    'from': account.address,
+                    'nonce': nonce,
+                    'gas': gas_limit,
+                    **fees
+                })
+
+                logger.debug("Transaction built: %s", tx)
+
+                submission = await replacer.engine.submit(w3, account, tx, kind='swap')
+                tx_hash = submission.hashes[-1]
+            metrics.log_sampled(logger, 'swap_sent', "Transaksi swap terkirim: https://testnet.storyscan.xyz/tx/%s", tx_hash.hex())
+
+            receipt = await wait_receipt(w3, submission)
+            if receipt is not None:
+                nonce = None
+            if receipt is not None and receipt['status'] == 1:
+                # Hasil swap dihitung dari log Transfer token dan Withdrawal WETH di receipt
+                amount_sent = receipt_logs.sent(receipt, token_address, account.address)
+                amount_received = receipt_logs.native_out(receipt, weth_address)
+                metrics.log_sampled(logger, 'swap_ok', "Swap berhasil. %d %s ditukar menjadi %d IP (CKB)", amount_sent, token_address, amount_received)
+                return amount_sent or amount_in
             else:
+                if receipt is not None:
+                    logger.error(f"Transaksi gagal: {tx_hash.hex()}")
                 logger.error("Transaksi swap gagal dikonfirmasi")
                 if attempt < max_retries - 1:
-                    logger.info(f"Mencoba swap lagi... (Percobaan {attempt + 2}/{max_retries})")
-                    await asyncio.sleep(5)
+                    logger.info("Mencoba swap lagi... (Percobaan %d/%d)", attempt + 2, max_retries)
+                    await asyncio.sleep(2 * (attempt + 1))
                 else:
                     logger.error("Semua percobaan swap gagal.")
                     return False
         except Exception as e:
-            logger.error(f"Error selama swap: {str(e)}")
-            logger.error(f"Error type: {type(e).__name__}")
-            logger.error(f"Error args: {e.args}")
+            logger.error("Error selama swap (%s): %s", type(e).__name__, e)
+            if nonce is not None and nonce not in nonces.pending(account.address):
+                nonces.release(account.address, nonce)
+                nonce = None
             if attempt < max_retries - 1:
-                logger.info(f"Menunggu sebelum mencoba lagi... (Percobaan {attempt + 2}/{max_retries})")
-                await asyncio.sleep(5)
+                logger.info("Menunggu sebelum mencoba lagi... (Percobaan %d/%d)", attempt + 2, max_retries)
+                await asyncio.sleep(2 * (attempt + 1))
             else:
                 logger.error("Semua percobaan swap gagal.")
                 return False
 
     return False
 
-async def perform_swaps(w3, account):
-    for token, address in config.TOKEN_ADDRESSES.items():
-        balance = get_token_balance(w3, Web3.to_checksum_address(address), account.address)
-        logger.info(f"Saldo saat ini dari {token}: {balance}")
-        if balance > 0:
-            current_allowance = check_allowance(w3, Web3.to_checksum_address(address), account.address, ROUTER_ADDRESS)
-            if current_allowance < balance:
-                if approve_token(w3, account, Web3.to_checksum_address(address), ROUTER_ADDRESS):
-                    logger.info(f"Menunggu 15 detik setelah persetujuan untuk {token}")
-                    await asyncio.sleep(15)  # Tunggu 15 detik setelah persetujuan
-                else:
-                    logger.error(f"Gagal melakukan approval untuk {token}")
-                    continue
-
-            ckb_balance = w3.eth.get_balance(account.address)
-            logger.info(f"Saldo CKB: {ckb_balance}")
-
-            if await swap_token_with_retry(w3, account, Web3.to_checksum_address(address), balance):
-                logger.info(f"Berhasil menukar {balance} dari {token} ke IP untuk {account.address}")
-            else:
-                logger.error(f"Gagal menukar {token} untuk {account.address}")
+async def approve_account(w3, account, account_state, send_lock, round_id, stages, presigned, store=state_store.store):
+    # Semua approval satu akun dikirim beruntun lalu dikonfirmasi bersamaan
+    ready, tokens, tasks = [], [], []
+    for token, address in contracts.TOKEN_ADDRESSES.items():
+        if stages.get((account.address, token)) in FINISHED_STAGES:
+            continue
+        token_state = account_state['tokens'][address]
+        balance = token_state['balance']
+        logger.debug("Saldo saat ini dari %s: %s", token, balance)
+        if balance is None:
+            # Saldo gagal dibaca; tidak ditandai selesai agar dicoba lagi saat dilanjutkan
+            logger.warning(f"Saldo {token} untuk {account.address} gagal dibaca, dilewati")
+            continue
+        if balance == 0:
+            logger.info("Tidak ada saldo untuk %s di %s", token, account.address)
+            store.set_swap_stage(round_id, account.address, token, 'skipped')
+            continue
+        # Allowance yang gagal dibaca (None) dibaca ulang oleh approve_token
+        if token_state['allowance'] is not None and token_state['allowance'] >= balance:
+            ready.append(token)
+        else:
+            tokens.append(token)
+            tasks.append(approve_token(
+                w3, account, address, ROUTER_ADDRESS, send_lock, token_state['allowance'],
+                presigned=presigned.get((account.address, token))
+            ))
+
+    for token, approved in zip(tokens, await asyncio.gather(*tasks)):
+        if approved:
+            # State akun diperbarui di tempat agar pemanggil tidak perlu membaca ulang allowance
+            account_state['tokens'][contracts.TOKEN_ADDRESSES[token]]['allowance'] = MAX_UINT256
+            store.set_swap_stage(round_id, account.address, token, 'approved')
+            ready.append(token)
         else:
-            logger.info(f"Tidak ada saldo untuk {token} di {account.address}")
+            logger.error(f"Gagal melakukan approval untuk {token}")
+    return ready
+
+async def swap_account(w3, account, account_state, send_lock, tokens, quotes, round_id, store=state_store.store):
+    ckb_balance = account_state['balance']
+    logger.debug("Saldo CKB: %s", ckb_balance)
+
+    async def swap(token):
+        address = contracts.TOKEN_ADDRESSES[token]
+        balance = account_state['tokens'][address]['balance']
+        quote = quotes.get((address, balance))
+        if quote is None:
+            logger.error(f"Tidak ada rute swap untuk {token} di {account.address}")
+            return
+        known_state = (ckb_balance, balance) if ckb_balance is not None else None
+        swapped = await swap_token_with_retry(w3, account, address, balance, send_lock, known_state=known_state, quote=quote)
+        if swapped:
+            metrics.log_sampled(logger, 'swap_done', "Berhasil menukar %s dari %s ke IP untuk %s", swapped, token, account.address)
+            # Dikurangi, bukan di-nol-kan: klaim yang masuk selama swap tetap tercatat
+            token_state = account_state['tokens'][address]
+            token_state['balance'] = max(0, token_state['balance'] - swapped)
+            store.set_swap_stage(round_id, account.address, token, 'swapped')
+        else:
+            logger.error(f"Gagal menukar {token} untuk {account.address}")
+
+    await asyncio.gather(*(swap(token) for token in tokens))
+
+async def presign_approvals(w3, accounts, state, stages, nonces=nonce_manager.manager):
+    # Semua approval yang dibutuhkan putaran ini dirakit dengan nonce dan fee yang
+    # sudah diketahui, lalu ditandatangani sekaligus di process pool
+    fees = await fee_oracle.oracle.async_fees()
+    chain_id = await w3.eth.chain_id
+    keys, unsigned = [], []
+    for account in accounts:
+        # Akun yang nonce-nya belum diketahui mengirim approval lewat jalur biasa
+        if not nonces.is_synced(account.address):
+            continue
+        for token, address in contracts.TOKEN_ADDRESSES.items():
+            if stages.get((account.address, token)) in FINISHED_STAGES:
+                continue
+            token_state = state['accounts'][account.address]['tokens'][address]
+            balance, allowance = token_state['balance'], token_state['allowance']
+            if not balance or allowance is None or allowance >= balance:
+                continue
+            nonce = nonces.reserve(account.address)
+            keys.append((account.address, token))
+            unsigned.append((account, contracts.approve_transaction(address, ROUTER_ADDRESS, MAX_UINT256, nonce, fees, chain_id)))
+    signed = await signer.sign_batch(unsigned)
+    return {key: (tx, raw_tx) for key, (_, tx), (raw_tx, _) in zip(keys, unsigned, signed)}
+
+async def perform_swaps(w3, accounts, state, round_id, stages=None, concurrency=config.SWAP_CONCURRENCY, send_locks=None):
+    stages = stages or {}
+    # Tahap 1: approval untuk semua akun sekaligus; tahap 2: swap untuk token yang
+    # approval-nya sudah terkonfirmasi. Lock per akun menjaga urutan nonce.
+    semaphore = asyncio.Semaphore(concurrency)
+    if send_locks is None:
+        send_locks = {account.address: asyncio.Lock() for account in accounts}
+    for account in accounts:
+        if state['accounts'][account.address]['nonce'] is not None:
+            nonce_manager.manager.sync(account.address, state['accounts'][account.address]['nonce'])
+
+    presigned = await presign_approvals(w3, accounts, state, stages)
+    logger.info(f"Menjalankan approval untuk {len(accounts)} akun")
+    with metrics.timer('stage_seconds', 'approve_batch', metrics.INCLUSION_BUCKETS):
+        ready = await asyncio.gather(*(
+            rate_limiter.run_limited(semaphore, approve_account(w3, account, state['accounts'][account.address], send_locks[account.address], round_id, stages, presigned))
+            for account in accounts
+        ))
+
+    # Quote seluruh pasangan (token, saldo) yang siap swap dalam satu panggilan batch
+    swaps = {
+        (contracts.TOKEN_ADDRESSES[token], state['accounts'][account.address]['tokens'][contracts.TOKEN_ADDRESSES[token]]['balance'])
+        for account, tokens in zip(accounts, ready) for token in tokens
+    }
+    quotes = {}
+    if swaps:
+        weth_address = await contracts.registry(w3).weth(ROUTER_ADDRESS)
+        quotes = await asyncio.to_thread(quoter.quote_swaps, list(swaps), weth_address)
+
+    logger.info(f"Menjalankan swap untuk {sum(1 for tokens in ready if tokens)} akun")
+    with metrics.timer('stage_seconds', 'swap_batch', metrics.INCLUSION_BUCKETS):
+        await asyncio.gather(*(
+            rate_limiter.run_limited(semaphore, swap_account(w3, account, state['accounts'][account.address], send_locks[account.address], tokens, quotes, round_id))
+            for account, tokens in zip(accounts, ready) if tokens
+        ))
+
+    await asyncio.gather(*(nonce_manager.fill_nonce_gaps(w3, account) for account in accounts))
+    await asyncio.to_thread(state_store.store.flush)
+
+def start_round(store=state_store.store):
+    # Putaran yang belum selesai dilanjutkan; jika sudah selesai, tunggu sisa jeda
+    # dari waktu selesainya, bukan 24 jam penuh dari awal
+    round_id = store.get_meta('swap_round')
+    finished_at = store.get_meta('swap_round_done')
+    if round_id and (finished_at is None or float(finished_at) < float(round_id)):
+        logger.info(f"Melanjutkan putaran swap yang belum selesai ({round_id})")
+        return round_id, 0
+    wait = 0
+    if finished_at:
+        wait = max(0, float(finished_at) + config.SWAP_ROUND_INTERVAL - time.time())
+    return None, wait
 
 async def main():
-    w3, accounts = setup_web3()
+    metrics.start()
+    w3, accounts = await setup_web3()
 
     logger.info(f"Menggunakan Router Address: {ROUTER_ADDRESS}")
     if not await check_router_contract(w3, ROUTER_ADDRESS):
@@ -279,15 +387,42 @@ async def main():
         return
 
     try:
+        store = state_store.store
+        await asyncio.to_thread(store.reconcile)
+        round_id, wait = await asyncio.to_thread(start_round, store)
         while True:
-            for account in accounts:
-                logger.info(f"Performing swaps for {account.address}")
-                await perform_swaps(w3, account)
-
+            if wait > 0:
+                next_run = datetime.now() + timedelta(seconds=wait)
+                logger.info(f"Next run scheduled at: {next_run}")
+                await asyncio.sleep(wait)
+            if round_id is None:
+                round_id = str(time.time())
+                store.set_meta('swap_round', round_id)
+
+            try:
+                # Akun yang seluruh tokennya sudah selesai di putaran ini tidak di-snapshot ulang
+                stages = await asyncio.to_thread(store.swap_stages, round_id)
+                pending = [
+                    account for account in accounts
+                    if any(stages.get((account.address, token)) not in FINISHED_STAGES for token in contracts.TOKEN_ADDRESSES)
+                ]
+
+                # Snapshot saldo, allowance dan nonce akun yang tersisa lewat Multicall3 + JSON-RPC batch
+                if pending:
+                    state = await asyncio.to_thread(
+                        multicall.fleet_snapshot, [account.address for account in pending], config.TOKEN_ADDRESSES.values(), ROUTER_ADDRESS
+                    )
+                    await perform_swaps(w3, pending, state, round_id, stages)
+            except Exception as e:
+                # Putaran yang sama dilanjutkan; tahap yang sudah selesai tercatat di state store
+                logger.error(f"Putaran swap gagal: {e}, dicoba lagi dalam {config.CLAIM_RETRY_DELAY} detik")
+                wait = config.CLAIM_RETRY_DELAY
+                continue
+
+            store.set_meta('swap_round_done', str(time.time()))
+            await asyncio.to_thread(store.flush)
             logger.info("All swaps completed. Waiting for 24 hours before next round.")
-            next_run = datetime.now() + timedelta(hours=24)
-            logger.info(f"Next run scheduled at: {next_run}")
-            await asyncio.sleep(24 * 60 * 60)  # Sleep for 24 hours
+            round_id, wait = None, config.SWAP_ROUND_INTERVAL
     except KeyboardInterrupt:
         logger.info("Program dihentikan oleh pengguna.")
     except Exception as e:
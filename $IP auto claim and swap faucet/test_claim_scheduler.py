@@ -0,0 +1,68 @@
+import asyncio
+import time
+import rpc_pool
+from claim_scheduler import ClaimScheduler
+
+class Pool:
+    def __init__(self, rate):
+        self._rate = rate
+
+    def rate(self):
+        return self._rate
+
+def run_for(scheduler, dispatch, seconds, **kwargs):
+    # Scheduler berjalan terus (klaim dijadwalkan ulang), jadi dihentikan setelah `seconds`
+    async def run():
+        task = asyncio.create_task(scheduler.run(dispatch, **kwargs))
+        await asyncio.sleep(seconds)
+        task.cancel()
+    asyncio.run(run())
+
+def make_scheduler(monkeypatch, jobs, rate=6, retry_delay=1000):
+    # Dengan rate kecil setiap irisan hanya berisi satu klaim (batas bawah irisan)
+    monkeypatch.setattr(rpc_pool, 'pool', Pool(rate))
+    scheduler = ClaimScheduler(cooldown=1000, retry_delay=retry_delay, store=None)
+    for i in range(jobs):
+        scheduler.schedule(f'0x{i}', 'T', 0)
+    return scheduler
+
+def test_slices_do_not_wait_for_slow_claims(monkeypatch):
+    scheduler = make_scheduler(monkeypatch, jobs=3, rate=6)
+    started = []
+
+    async def dispatch(jobs):
+        started.append(time.monotonic())
+        await asyncio.sleep(1)
+        return {job: True for job in jobs}
+
+    run_for(scheduler, dispatch, 1.2, window=0.05)
+    assert len(started) == 3
+    # Irisan kedua dan ketiga mulai sebelum irisan pertama selesai
+    assert started[-1] - started[0] < 0.5
+    assert all(eligible_at > time.time() for eligible_at, *_ in scheduler.queue)
+
+def test_concurrency_caps_claims_in_flight(monkeypatch):
+    scheduler = make_scheduler(monkeypatch, jobs=4, rate=600)
+    in_flight, peak = [0], [0]
+
+    async def dispatch(jobs):
+        in_flight[0] += len(jobs)
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.05)
+        in_flight[0] -= len(jobs)
+        return {job: True for job in jobs}
+
+    run_for(scheduler, dispatch, 0.3, window=0, concurrency=2)
+    assert peak[0] == 2
+    assert len(scheduler.queue) == 4
+
+def test_dispatch_error_reschedules_jobs_as_unknown(monkeypatch):
+    scheduler = make_scheduler(monkeypatch, jobs=2, rate=600)
+    scheduler.refresh = lambda jobs: {job: None for job in jobs}
+
+    async def dispatch(jobs):
+        raise Exception('eth_gasPrice gagal dibaca')
+
+    run_for(scheduler, dispatch, 0.1, window=0)
+    assert scheduler.unknown == {('0x0', 'T'), ('0x1', 'T')}
+    assert all(eligible_at > time.time() + 500 for eligible_at, *_ in scheduler.queue)
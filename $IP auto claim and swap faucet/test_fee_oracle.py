@@ -0,0 +1,60 @@
+import time
+import config
+from fee_oracle import FeeOracle
+
+def oracle_with(gas_price=100, base_fee=None, priority_fee=None):
+    oracle = FeeOracle(ttl=60)
+    oracle.cached = {'gas_price': gas_price, 'base_fee': base_fee, 'priority_fee': priority_fee}
+    oracle.fetched_at = time.time()
+    return oracle
+
+def test_fees_legacy_and_eip1559():
+    assert oracle_with(gas_price=100).fees() == {'gasPrice': 100}
+    assert oracle_with(base_fee=50, priority_fee=10).fees() == {'maxPriorityFeePerGas': 10, 'maxFeePerGas': 110}
+
+def test_bump_from_meets_replacement_minimum():
+    bumped = oracle_with().bump_from({'gasPrice': 1000})
+    assert bumped['gasPrice'] > 1000 * 1.1
+
+def test_bump_follows_market_when_higher():
+    oracle = oracle_with(gas_price=150)
+    assert oracle.bump({'gasPrice': 100}, {'gasPrice': 100}) == {'gasPrice': 150}
+
+def test_bump_market_is_capped_at_max_multiplier():
+    oracle = oracle_with(gas_price=10_000)
+    assert oracle.bump({'gasPrice': 100}, {'gasPrice': 100}) == {'gasPrice': 100 * config.FEE_MAX_MULTIPLIER}
+
+def test_bump_returns_none_past_cap():
+    oracle = oracle_with(gas_price=100)
+    fees = {'gasPrice': 100}
+    while fees is not None:
+        assert fees['gasPrice'] <= 100 * config.FEE_MAX_MULTIPLIER
+        fees = oracle.bump(fees, {'gasPrice': 100})
+
+def fee_node(history_error):
+    def handler(method, params):
+        if method == 'eth_gasPrice':
+            return hex(100)
+        if history_error:
+            return {'error': history_error}
+        return {'baseFeePerGas': [hex(40), hex(50)], 'reward': [[hex(10)]]}
+    return handler
+
+def test_refresh_reads_eip1559_fees(fake_pool):
+    fake_pool(fee_node(None))
+    data = FeeOracle().refresh()
+    assert (data['base_fee'], data['priority_fee']) == (50, config.FEE_MIN_PRIORITY)
+
+def test_transient_fee_history_error_keeps_eip1559(fake_pool):
+    pool = fake_pool(fee_node({'code': -32005, 'message': 'limit exceeded'}))
+    oracle = FeeOracle()
+    assert oracle.refresh()['base_fee'] is None
+    assert oracle.use_eip1559
+    pool.handler = fee_node(None)
+    assert oracle.refresh()['base_fee'] == 50
+
+def test_unsupported_fee_history_switches_to_legacy(fake_pool):
+    fake_pool(fee_node({'code': -32601, 'message': 'the method eth_feeHistory does not exist'}))
+    oracle = FeeOracle()
+    oracle.refresh()
+    assert not oracle.use_eip1559
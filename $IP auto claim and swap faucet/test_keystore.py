@@ -0,0 +1,18 @@
+import pickle
+from eth_account import Account
+from eth_utils import to_checksum_address
+import keystore
+
+KEY = '0x' + '11' * 32
+
+def test_decrypt_keyfile_returns_account_with_derived_address():
+    keyfile = Account.encrypt(KEY, 'pw', kdf='pbkdf2', iterations=2)
+    account = keystore.decrypt_keyfile((keyfile, 'pw'))
+    assert account.address == to_checksum_address(keyfile['address'])
+
+def test_account_from_worker_survives_pickling():
+    # Akun dikirim dari process pool lewat pickle; alamat dan key harus tetap sama
+    keyfile = Account.encrypt(KEY, 'pw', kdf='pbkdf2', iterations=2)
+    account = pickle.loads(pickle.dumps(keystore.decrypt_keyfile((keyfile, 'pw'))))
+    assert account.address == Account.from_key(KEY).address
+    assert account.key == Account.from_key(KEY).key
@@ -0,0 +1,16 @@
+from metrics import Metrics
+
+def test_rpc_batch_counts_items_per_method():
+    registry = Metrics()
+    registry.rpc_batch(['eth_call', 'eth_call', 'eth_getBalance'], 0.2, errors=['eth_call'])
+    assert registry.counters[('rpc_http_requests_total', None)] == 1
+    assert registry.counters[('rpc_calls_total', 'eth_call')] == 2
+    assert registry.counters[('rpc_calls_total', 'eth_getBalance')] == 1
+    assert registry.counters[('rpc_errors_total', 'eth_call')] == 1
+    assert registry.histograms[('rpc_latency_seconds', 'eth_getBalance')].count == 1
+    assert registry.histograms[('rpc_latency_seconds', 'batch')].count == 1
+
+def test_render_uses_method_label():
+    registry = Metrics()
+    registry.rpc('eth_chainId', 0.01)
+    assert 'rpc_calls_total{method="eth_chainId"} 1' in registry.render()
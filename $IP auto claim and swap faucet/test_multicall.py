@@ -0,0 +1,78 @@
+from eth_abi import decode, encode
+import config
+import multicall
+import rpc_batch
+from conftest import FakePool
+
+TOKEN = '0x2222222222222222222222222222222222222222'
+
+def uint(value):
+    return '0x' + encode(['uint256'], [value]).hex()
+
+def fake_multicall(results):
+    # Multicall3 palsu: setiap sub-call dijawab oleh results(target, data) -> (success, bytes)
+    def handler(method, params):
+        call = params[0]
+        data = bytes.fromhex(call['data'][2:])
+        if call['to'] == config.MULTICALL_ADDRESS:
+            calls = decode(['(address,bool,bytes)[]'], data[4:])[0]
+            return '0x' + encode(['(bool,bytes)[]'], [[results(target, calldata) for target, _, calldata in calls]]).hex()
+        success, output = results(call['to'], data)
+        return '0x' + output.hex() if success else {'error': {'code': 3, 'message': 'execution reverted'}}
+    return handler
+
+def test_chunk_calls_splits_by_call_count():
+    calls = [(TOKEN, b'\x00' * 4)] * 5
+    chunks = list(multicall.chunk_calls(calls, gas_limit=100, call_gas=40))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+
+def test_chunk_calls_splits_by_calldata_size():
+    calls = [(TOKEN, b'\x00' * 100)] * 4
+    max_calldata = 2 * (multicall.CALL_OVERHEAD_BYTES + 100)
+    chunks = list(multicall.chunk_calls(calls, max_calldata=max_calldata))
+    assert [len(chunk) for chunk in chunks] == [2, 2]
+
+def test_chunk_calls_keeps_oversized_call_alone():
+    calls = [(TOKEN, b'\x00' * 1000)] * 2
+    assert [len(chunk) for chunk in multicall.chunk_calls(calls, max_calldata=10)] == [1, 1]
+
+def test_decode_uint_failure_is_unknown():
+    assert multicall.decode_uint(True, encode(['uint256'], [7])) == 7
+    assert multicall.decode_uint(False, b'') is None
+    assert multicall.decode_uint(True, b'\x01') is None
+
+def test_aggregate_carries_sub_call_failure(monkeypatch):
+    monkeypatch.setattr(multicall, '_available', True)
+    pool = FakePool(fake_multicall(lambda target, data: (data[-1] != 2, encode(['uint256'], [data[-1]]))))
+    calls = [(TOKEN, bytes([i])) for i in range(1, 4)]
+    results = multicall.aggregate(calls, rpc_batch.RpcBatcher(pool=pool))
+    assert [multicall.decode_uint(*result) for result in results] == [1, None, 3]
+    assert len(pool.payloads) == 1
+
+def test_aggregate_falls_back_through_callers_pool_without_multicall(monkeypatch):
+    monkeypatch.setattr(multicall, '_available', True)
+
+    def handler(method, params):
+        if params[0]['to'] == config.MULTICALL_ADDRESS:
+            return '0x'
+        return uint(int(params[0]['data'][-2:], 16))
+
+    pool = FakePool(handler)
+    results = multicall.aggregate([(TOKEN, bytes([5])), (TOKEN, bytes([6]))], rpc_batch.RpcBatcher(pool=pool))
+    assert [multicall.decode_uint(*result) for result in results] == [5, 6]
+    assert not multicall.enabled()
+    # Fallback memakai pool pemanggil, bukan rpc_pool.pool global
+    assert len(pool.payloads) == 2
+
+def test_aggregate_falls_back_when_aggregate_call_fails(monkeypatch):
+    monkeypatch.setattr(multicall, '_available', True)
+
+    def handler(method, params):
+        if params[0]['to'] == config.MULTICALL_ADDRESS:
+            return {'error': {'code': -32000, 'message': 'out of gas'}}
+        return uint(9)
+
+    pool = FakePool(handler)
+    results = multicall.aggregate([(TOKEN, b'\x01')], rpc_batch.RpcBatcher(pool=pool))
+    assert [multicall.decode_uint(*result) for result in results] == [9]
+    assert multicall.enabled()
@@ -0,0 +1,64 @@
+from nonce_manager import NonceManager
+
+ADDRESS = '0x1111111111111111111111111111111111111111'
+
+def make_manager(chain_nonce=5, drop_timeout=60):
+    manager = NonceManager(drop_timeout=drop_timeout)
+    manager.sync(ADDRESS, chain_nonce)
+    return manager
+
+def test_reserve_is_sequential_from_chain_nonce():
+    manager = make_manager()
+    assert [manager.reserve(ADDRESS) for _ in range(3)] == [5, 6, 7]
+    assert manager.gaps(ADDRESS) == []
+
+def test_release_of_top_nonce_shrinks_next():
+    manager = make_manager()
+    first, second = manager.reserve(ADDRESS), manager.reserve(ADDRESS)
+    manager.release(ADDRESS, second)
+    manager.release(ADDRESS, first)
+    assert manager.reserve(ADDRESS) == 5
+    assert manager.gaps(ADDRESS) == []
+
+def test_released_middle_nonce_is_gap_and_reused_first():
+    manager = make_manager()
+    nonces = [manager.reserve(ADDRESS) for _ in range(3)]
+    manager.mark_sent(ADDRESS, nonces[0], b'a')
+    manager.mark_sent(ADDRESS, nonces[2], b'c')
+    manager.release(ADDRESS, nonces[1])
+    assert manager.gaps(ADDRESS) == [6]
+    assert manager.reserve(ADDRESS) == 6
+    assert manager.reserve(ADDRESS) == 8
+
+def test_mark_mined_advances_base():
+    manager = make_manager()
+    for nonce in [manager.reserve(ADDRESS) for _ in range(3)]:
+        manager.mark_sent(ADDRESS, nonce, bytes([nonce]))
+    manager.mark_mined(ADDRESS, 6)
+    assert manager.pending(ADDRESS) == {7: bytes([7])}
+
+def test_sync_with_higher_chain_nonce_drops_old_state():
+    manager = make_manager()
+    for nonce in [manager.reserve(ADDRESS) for _ in range(2)]:
+        manager.mark_sent(ADDRESS, nonce, bytes([nonce]))
+    manager.sync(ADDRESS, 9)
+    assert manager.pending(ADDRESS) == {}
+    assert manager.reserve(ADDRESS) == 9
+
+def test_sync_with_lower_chain_nonce_keeps_recent_sends():
+    manager = make_manager(drop_timeout=60)
+    for nonce in [manager.reserve(ADDRESS) for _ in range(2)]:
+        manager.mark_sent(ADDRESS, nonce, bytes([nonce]))
+    manager.sync(ADDRESS, 5)
+    assert manager.gaps(ADDRESS) == []
+    assert set(manager.pending(ADDRESS)) == {5, 6}
+
+def test_sync_turns_dropped_sends_into_gaps_after_deadline():
+    manager = make_manager(drop_timeout=0)
+    for nonce in [manager.reserve(ADDRESS) for _ in range(3)]:
+        manager.mark_sent(ADDRESS, nonce, bytes([nonce]))
+    # Node hanya mengenal nonce 5; nonce 6 dan 7 sudah dibuang dari mempool
+    manager.sync(ADDRESS, 6)
+    assert manager.gaps(ADDRESS) == [6, 7]
+    assert manager.pending(ADDRESS) == {}
+    assert manager.reserve(ADDRESS) == 6
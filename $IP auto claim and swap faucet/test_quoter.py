@@ -0,0 +1,38 @@
+from eth_abi import decode, encode
+import config
+import multicall
+import quoter
+
+TOKEN = '0x2222222222222222222222222222222222222222'
+WETH = '0x3333333333333333333333333333333333333333'
+
+def router(liquidity):
+    # Router palsu: getAmountsOut mengembalikan amount * 2 selama amount <= liquidity, selain itu revert
+    def handler(method, params):
+        data = bytes.fromhex(params[0]['data'][2:])
+        amount, path = decode(['uint256', 'address[]'], data[4:])
+        if amount > liquidity:
+            return {'error': {'code': 3, 'message': 'execution reverted'}}
+        return '0x' + encode(['uint256[]'], [[amount, amount * 2]]).hex()
+    return handler
+
+def test_candidate_amounts_halves_down_to_zero():
+    assert quoter.candidate_amounts(20) == [20, 10, 5, 2, 1]
+    assert quoter.candidate_amounts(3) == [3, 1]
+
+def test_quote_swaps_picks_largest_executable_amount(fake_pool, monkeypatch):
+    monkeypatch.setattr(multicall, '_available', False)
+    fake_pool(router(liquidity=30))
+    quotes = quoter.quote_swaps([(TOKEN, 100), (TOKEN, 20)], WETH, slippage=0.5)
+    # 100 dan 50 melebihi likuiditas, 25 masih bisa
+    assert quotes[(TOKEN, 100)] == (25, 25)
+    assert quotes[(TOKEN, 20)] == (20, 20)
+
+def test_quote_swaps_without_route_is_none(fake_pool, monkeypatch):
+    monkeypatch.setattr(multicall, '_available', False)
+    fake_pool(router(liquidity=0))
+    assert quoter.quote_swaps([(TOKEN, 8)], WETH) == {(TOKEN, 8): None}
+
+def test_decode_amount_out_failure_is_zero():
+    assert quoter.decode_amount_out(False, b'') == 0
+    assert quoter.decode_amount_out(True, encode(['uint256[]'], [[5, 11]])) == 11
@@ -0,0 +1,32 @@
+import config
+from rate_limiter import RateLimiter
+
+def test_reserve_within_burst_does_not_wait():
+    limiter = RateLimiter(rate=10, burst=5)
+    assert [limiter.reserve() for _ in range(5)] == [0] * 5
+
+def test_reserve_past_burst_waits_for_refill():
+    limiter = RateLimiter(rate=10, burst=1)
+    assert limiter.reserve() == 0
+    wait = limiter.reserve()
+    assert 0.05 < wait <= 0.1
+
+def test_on_success_increases_additively_up_to_max():
+    limiter = RateLimiter(rate=10, max_rate=10.5)
+    limiter.on_success()
+    assert limiter.rate == 10 + config.RATE_LIMIT_INCREASE / 10
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.rate == 10.5
+
+def test_on_throttle_halves_once_per_interval():
+    limiter = RateLimiter(rate=40, min_rate=1)
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.rate == 40 * config.RATE_LIMIT_DECREASE
+    assert limiter.tokens <= 0
+
+def test_on_throttle_respects_min_rate():
+    limiter = RateLimiter(rate=2, min_rate=1.5)
+    limiter.on_throttle()
+    assert limiter.rate == 1.5
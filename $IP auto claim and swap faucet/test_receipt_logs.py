@@ -0,0 +1,50 @@
+from eth_abi import encode
+from web3 import Web3
+import receipt_logs
+
+TOKEN = '0x2222222222222222222222222222222222222222'
+WETH = '0x3333333333333333333333333333333333333333'
+ALICE = '0x1111111111111111111111111111111111111111'
+BOB = '0x4444444444444444444444444444444444444444'
+
+def topic(address):
+    return '0x' + address[2:].lower().rjust(64, '0')
+
+def transfer(token, sender, to, value):
+    return {
+        'address': token,
+        'topics': [receipt_logs.TRANSFER_TOPIC, topic(sender), topic(to)],
+        'data': Web3.to_hex(encode(['uint256'], [value])),
+    }
+
+def withdrawal(weth, owner, value):
+    return {
+        'address': weth,
+        'topics': [receipt_logs.WITHDRAWAL_TOPIC, topic(owner)],
+        'data': Web3.to_hex(encode(['uint256'], [value])),
+    }
+
+def test_decode_transfers_skips_other_events():
+    logs = [transfer(TOKEN, ALICE, BOB, 5), withdrawal(WETH, ALICE, 3)]
+    assert receipt_logs.decode_transfers(logs) == [(TOKEN, ALICE, BOB, 5)]
+
+def test_decode_transfers_accepts_bytes_topics_and_data():
+    log = transfer(TOKEN, ALICE, BOB, 7)
+    log = {**log, 'topics': [bytes.fromhex(t[2:]) for t in log['topics']], 'data': bytes.fromhex(log['data'][2:])}
+    assert receipt_logs.decode_transfers([log]) == [(TOKEN, ALICE, BOB, 7)]
+
+def test_received_and_sent_filter_by_token_and_account():
+    other = '0x5555555555555555555555555555555555555555'
+    receipt = {'logs': [
+        transfer(TOKEN, BOB, ALICE, 10),
+        transfer(TOKEN, BOB, ALICE, 5),
+        transfer(other, BOB, ALICE, 100),
+        transfer(TOKEN, ALICE, BOB, 4),
+    ]}
+    assert receipt_logs.received(receipt, TOKEN, ALICE) == 15
+    assert receipt_logs.sent(receipt, TOKEN, ALICE) == 4
+    assert receipt_logs.received(receipt, TOKEN.lower(), ALICE.lower()) == 15
+
+def test_native_out_sums_withdrawals_from_weth_only():
+    receipt = {'logs': [withdrawal(WETH, ALICE, 3), withdrawal(WETH, ALICE, 2), withdrawal(TOKEN, ALICE, 50)]}
+    assert receipt_logs.native_out(receipt, WETH) == 5
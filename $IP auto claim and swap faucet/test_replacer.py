@@ -0,0 +1,104 @@
+import asyncio
+import config
+import replacer
+from fee_oracle import FeeOracle
+
+class Account:
+    address = '0x1111111111111111111111111111111111111111'
+
+class Nonces:
+    def mark_sent(self, *args):
+        pass
+
+    def mark_mined(self, *args):
+        pass
+
+class Tracker:
+    last_block = 1
+    poll_interval = 0.01
+
+    async def wait(self, tx_hash, timeout):
+        await asyncio.sleep(timeout)
+        raise asyncio.TimeoutError()
+
+class Eth:
+    def __init__(self):
+        self.sent = []
+
+    async def send_raw_transaction(self, raw_tx):
+        self.sent.append(raw_tx)
+        return bytes([len(self.sent)])
+
+class W3:
+    def __init__(self):
+        self.eth = Eth()
+
+async def fake_sign(account, tx):
+    return b'raw', None
+
+def make_engine(monkeypatch, expire_after=60):
+    monkeypatch.setattr(replacer.signer, 'sign', fake_sign)
+    return replacer.ReplacementEngine(
+        nonces=Nonces(), tracker=Tracker(), oracle=FeeOracle(), store=None, expire_after=expire_after
+    )
+
+TX = {'nonce': 3, 'maxFeePerGas': 1000, 'maxPriorityFeePerGas': 100}
+
+def test_resubmit_bumps_fees_of_same_submission(monkeypatch):
+    engine = make_engine(monkeypatch)
+    w3 = W3()
+
+    async def run():
+        first = await engine.submit(w3, Account(), dict(TX))
+        second = await engine.submit(w3, Account(), dict(TX))
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first is second
+    assert len(second.hashes) == 2
+    assert second.tx['maxFeePerGas'] > 1000 * 1.1
+
+def test_resubmit_never_exceeds_max_multiplier(monkeypatch):
+    engine = make_engine(monkeypatch)
+    w3 = W3()
+
+    async def run():
+        for _ in range(20):
+            submission = await engine.submit(w3, Account(), dict(TX))
+        return submission
+
+    submission = asyncio.run(run())
+    assert submission.capped
+    assert submission.tx['maxFeePerGas'] <= 1000 * config.FEE_MAX_MULTIPLIER
+    assert submission.tx['maxPriorityFeePerGas'] <= 100 * config.FEE_MAX_MULTIPLIER
+    assert len(w3.eth.sent) < 20
+
+def test_abandoned_submission_expires(monkeypatch):
+    engine = make_engine(monkeypatch, expire_after=0.01)
+    w3 = W3()
+
+    async def run():
+        submission = await engine.submit(w3, Account(), dict(TX))
+        try:
+            await engine.wait(w3, submission, timeout=0.02)
+        except asyncio.TimeoutError:
+            pass
+        assert engine.outstanding
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert engine.outstanding == {}
+
+def test_failed_first_send_is_not_kept(monkeypatch):
+    engine = make_engine(monkeypatch)
+    w3 = W3()
+
+    async def fail(raw_tx):
+        raise ValueError('nonce too low')
+
+    w3.eth.send_raw_transaction = fail
+    try:
+        asyncio.run(engine.submit(w3, Account(), dict(TX)))
+    except ValueError:
+        pass
+    assert engine.outstanding == {}